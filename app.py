@@ -1,32 +1,23 @@
 import streamlit as st
 import sys
+import hashlib
+from io import BytesIO
 import os
-import io
 from datetime import datetime
 from dotenv import load_dotenv
 load_dotenv()
 
-# --- NEW IMPORTS for Email Automation ---
-import smtplib
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
-from email.mime.application import MIMEApplication
 from email.utils import COMMASPACE 
-# ----------------------------------------
 
-# --- ReportLab Imports for advanced styling ---
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfgen import canvas
-from reportlab.lib.colors import HexColor
-from reportlab.platypus import Paragraph
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.enums import TA_LEFT
-
-from num2words import num2words
+# --- Heavy modules (ReportLab, num2words, smtplib, email.mime) are imported on first
+# render/send, and pre-warmed in the background once the UI is up (see warmup.py) ---
+from profiling import profiling_enabled, profile_generation
+from preview import show_preview
+from warmup import start_prewarm
+from config import get_config, ConfigError
 
 # Compatibility patch for hashlib on older Python versions
 if sys.version_info < (3, 9):
-    import hashlib
     original_md5 = hashlib.md5
     def patched_md5(*args, **kwargs):
         kwargs.pop('usedforsecurity', None)
@@ -39,39 +30,31 @@ SENDER_EMAIL = os.getenv("SENDER_EMAIL")
 SENDER_PASSWORD = os.getenv("SENDER_PASSWORD")      # Use an App Password for Gmail!
 INTERNAL_RECEIVER_EMAIL = os.getenv("INTERNAL_RECEIVER_EMAIL") # Internal recipient for the copy
 
-# --- SECONDARY CC LIST (Always included on customer emails, besides the primary) ---
-SECONDARY_CC_EMAILS = ["sandal@alfaleus.com"] 
-# -------------------
-SMTP_SERVER = "smtp.gmail.com"  # Use "smtp.office365.com" for Outlook
-SMTP_PORT = 587
-# ---------------------------------------------
-
-# --- NEW GENERATOR CONFIGURATION ---
-GENERATOR_DETAILS = {
-    "Kiran Shukla": "Head of Sales",
-    "Abdul Baquee": "Sales Coordinator",
-    "Pius Varghese": "Operations Manager",
-    "Sandal Kotawala": "CEO"
-}
-# --- PRIMARY CC MAPPING (New Dynamic Rule) ---
-PRIMARY_CC_MAPPING = {
-    "Kiran Shukla": "kiran.alfaleus@gmail.com",
-    "Sandal Kotawala": "info@alfaleus.com",
-    "Abdul Baquee": "abdul.alfaleus@gmail.com",
-    "Pius Varghese": "pius.alfaleus@gmail.com"
-}
+# --- SHARED CONFIGURATION (config.toml, reloaded when the file changes) ---
+try:
+    CONFIG = get_config()
+except ConfigError as e:
+    st.error(f"❌ Configuration error: {e}")
+    st.stop()
+SECONDARY_CC_EMAILS = CONFIG.secondary_cc_emails
+SMTP_SERVER = CONFIG.smtp_server
+SMTP_PORT = CONFIG.smtp_port
+GENERATOR_DETAILS = CONFIG.generator_details
+PRIMARY_CC_MAPPING = CONFIG.primary_cc_mapping
+COMPANY_NAME = CONFIG.company["name"]
+COMPANY_SHORT_NAME = CONFIG.company["short_name"]
 # -----------------------------------
 
 st.title("🏥 Alfaleus Doctor Quotation Generator")
 
-# Define PDF page dimensions and margins
-WIDTH, HEIGHT = A4
-BORDER_MARGIN = 20
-
 # --- MODIFIED Function to send the quotation PDF via email ---
 def send_quotation_email(quote_no, recipient_email, customer_name, pdf_buffer, generator_name, cc_emails=[], is_customer_send=False):
     """Sends the PDF quotation as an attachment to the specified email."""
-    
+    import smtplib
+    from email.mime.multipart import MIMEMultipart
+    from email.mime.text import MIMEText
+    from email.mime.application import MIMEApplication
+
     msg = MIMEMultipart()
     msg['From'] = SENDER_EMAIL
     msg['To'] = recipient_email
@@ -81,7 +64,7 @@ def send_quotation_email(quote_no, recipient_email, customer_name, pdf_buffer, g
 
     if is_customer_send:
         # Email content for the customer
-        msg['Subject'] = f"Sales Quotation {quote_no} from Alfaleus Tech Pvt Ltd"
+        msg['Subject'] = f"Sales Quotation {quote_no} from {COMPANY_SHORT_NAME}"
         
         # --- ADD CC for Customer Send ---
         msg['Cc'] = COMMASPACE.join(cc_emails)
@@ -95,7 +78,7 @@ def send_quotation_email(quote_no, recipient_email, customer_name, pdf_buffer, g
             f"Feel free to reach out if you have any questions.\n\n"
             f"Best regards,\n"
             f"{generator_name}\n"
-            f"{generator_title}, Alfaleus Technology Private Limited"
+            f"{generator_title}, {COMPANY_NAME}"
         )
         success_msg = f"📧 Quotation successfully sent to **{recipient_email}** (Customer) and CC'd to internal team: **{COMMASPACE.join(cc_emails)}**"
         error_prefix = "❌ Failed to send email to customer"
@@ -131,6 +114,29 @@ def send_quotation_email(quote_no, recipient_email, customer_name, pdf_buffer, g
         st.error(f"{error_prefix}: {e}")
         return False
 
+# --- Price breakdown shared by the preview and the final PDF ---
+def calculate_amounts(total_inclusive_gst, quantity, gst_percent):
+    """Returns (rate per unit excl. GST, total excl. GST, GST amount) for an inclusive total."""
+    rate_per_unit_inclusive = total_inclusive_gst / quantity
+    rate_per_unit_exclusive = rate_per_unit_inclusive / (1 + gst_percent / 100)
+    total_exclusive_gst = rate_per_unit_exclusive * quantity
+    gst_amount = total_inclusive_gst - total_exclusive_gst
+    return rate_per_unit_exclusive, total_exclusive_gst, gst_amount
+
+def price_line_items(rows, gst_percent):
+    """Prices (description, quantity, total incl. GST) rows.
+
+    Returns the (description, unit text, rate/unit excl. GST, total excl. GST)
+    line items for the PDF, plus the GST and inclusive total they add.
+    """
+    line_items, items_gst, items_total = [], 0.0, 0.0
+    for description, item_quantity, item_total in rows:
+        rate, total_exclusive, gst = calculate_amounts(item_total, item_quantity, gst_percent)
+        line_items.append((description, f"{item_quantity} Nos", rate, total_exclusive))
+        items_gst += gst
+        items_total += item_total
+    return line_items, items_gst, items_total
+
 # --- Form Inputs ---
 generator_name = st.selectbox(
     "Quotation Generated By:",
@@ -171,8 +177,8 @@ payment_terms = st.text_area("Payment Terms", value=default_payment_terms)
 
 
 # --- RATE INPUT PER UNIT ---
-RATE_PER_UNIT_MIN = 300000.00
-RATE_PER_UNIT_MAX = 480000.00
+RATE_PER_UNIT_MIN = CONFIG.rate_per_unit_min
+RATE_PER_UNIT_MAX = CONFIG.rate_per_unit_max
 
 # Calculate the value constraint based on quantity
 TOTAL_MIN = RATE_PER_UNIT_MIN * quantity
@@ -190,6 +196,49 @@ total_inclusive_gst = st.number_input(
 
 gst_percent = st.number_input("GST (%)", min_value=0.0, step=0.01, value=5.0)
 
+# --- ADDITIONAL LINE ITEMS (accessories, extended CMC, ...), listed after the main product ---
+additional_rows = []
+if st.checkbox("➕ Additional line items", value=False):
+    import pandas as pd
+    edited_items = st.data_editor(
+        pd.DataFrame({
+            "Description": pd.Series(dtype="str"),
+            "Quantity": pd.Series(dtype="int"),
+            "Total": pd.Series(dtype="float"),
+        }),
+        num_rows="dynamic",
+        hide_index=True,
+        key="additional_line_items",
+        column_config={
+            "Description": st.column_config.TextColumn("Description", required=True),
+            "Quantity": st.column_config.NumberColumn("Quantity", min_value=1, step=1, default=1, required=True),
+            "Total": st.column_config.NumberColumn("Total (Rs., Inclusive of GST)", min_value=0.0, format="%.2f", required=True),
+        },
+    )
+    additional_rows = [
+        (str(description), int(item_quantity), float(item_total))
+        for description, item_quantity, item_total in edited_items.dropna().itertuples(index=False)
+        if str(description).strip() and item_total > 0
+    ]
+line_items, line_items_gst, line_items_total = price_line_items(additional_rows, gst_percent)
+
+# --- LIVE PREVIEW (draft number, no emails sent) ---
+if st.checkbox("👁️ Live preview", value=False):
+    from documents import render_quotation
+    preview_rate, preview_total_exclusive, preview_gst_amount = calculate_amounts(
+        total_inclusive_gst, quantity, gst_percent
+    )
+    show_preview("quotation", render_quotation, dict(
+        quote_no="DRAFT", date_str=datetime.now().strftime("%d/%m/%Y"),
+        customer_name=customer_name, customer_email=customer_email, address=address, gstin=gstin,
+        product_description=product_description, unit_text=unit_text,
+        rate_per_unit_exclusive=preview_rate, total_exclusive_gst=preview_total_exclusive,
+        gst_percent=gst_percent, gst_amount=preview_gst_amount + line_items_gst,
+        total_inclusive_gst=total_inclusive_gst + line_items_total,
+        payment_terms=payment_terms, generator_name=generator_name, generator_title=generator_title,
+        line_items=line_items
+    ))
+
 st.divider() # Visual separation for email options
 
 # --- CHECKBOX LINE: value=False makes it unchecked by default ---
@@ -199,6 +248,9 @@ send_to_customer = st.checkbox(" Send a copy directly to the Customer Email", va
 st.caption(f"An internal copy will always be sent to **{INTERNAL_RECEIVER_EMAIL}**.")
 st.caption(f"If sending to the customer, the sender's primary email ({PRIMARY_CC_MAPPING.get(generator_name)}) and **{COMMASPACE.join(SECONDARY_CC_EMAILS)}** will be CC'd.")
 
+# The form is on screen: load the PDF/email stack in the background for the first Generate
+start_prewarm()
+
 if st.button("Generate Alfaleus Quotation PDF and Send Emails"):
     # Input validation
     if not customer_name:
@@ -218,11 +270,12 @@ if st.button("Generate Alfaleus Quotation PDF and Send Emails"):
         st.stop()
         
     # ---- Calculations ----
-    rate_per_unit_inclusive = total_inclusive_gst / quantity
-    rate_per_unit_exclusive = rate_per_unit_inclusive / (1 + gst_percent / 100)
-    
-    total_exclusive_gst = rate_per_unit_exclusive * quantity
-    gst_amount = total_inclusive_gst - total_exclusive_gst
+    rate_per_unit_exclusive, total_exclusive_gst, gst_amount = calculate_amounts(
+        total_inclusive_gst, quantity, gst_percent
+    )
+    # Whole quotation, including the additional line items
+    grand_total_inclusive_gst = total_inclusive_gst + line_items_total
+    total_gst_amount = gst_amount + line_items_gst
     # -------------------------------
     
     now = datetime.now()
@@ -234,187 +287,35 @@ if st.button("Generate Alfaleus Quotation PDF and Send Emails"):
     quote_no = f"ALF/{year_short:02d}-{next_year_short:02d}/{month_int:02d}/{micro_suffix:04d}"
     date_str = now.strftime("%d/%m/%Y")
 
-    buffer = io.BytesIO()
-    c = canvas.Canvas(buffer, pagesize=A4)
-    
-    # --- PDF Generation Logic ---
-    styles = getSampleStyleSheet()
-    para_style = ParagraphStyle(
-        'Normal_Left',
-        parent=styles['Normal'],
-        fontName='Helvetica',
-        fontSize=10,
-        leading=14,
-        alignment=TA_LEFT
-    )
-
-    c.rect(BORDER_MARGIN, BORDER_MARGIN, WIDTH - 2 * BORDER_MARGIN, HEIGHT - 2 * BORDER_MARGIN)
-
-    # Header
-    c.setFillColor(HexColor('#255290'))
-    c.setFont("Helvetica-Bold", 12)
-    c.drawCentredString(WIDTH / 2, HEIGHT - 40, "ALFALEUS TECHNOLOGY PRIVATE LIMITED")
-    c.setFillColorRGB(0, 0, 0)
-    c.setFont("Helvetica", 9)
-    c.drawCentredString(WIDTH / 2, HEIGHT - 55,
-        "Registered Office : II Floor, 654, Vivek Vihar, New Sanganare Road, Jaipur, Rajasthan - 302019")
-    c.drawCentredString(WIDTH / 2, HEIGHT - 68,
-        "CIN : U74999RJ2018PTC060255 | Mail : info@alfaleus.com | Contact : +91 96550 42547")
-
-    # Quotation Title
-    c.setFont("Helvetica-Bold", 14)
-    c.drawCentredString(WIDTH / 2, HEIGHT - 100, "Sales Quotation")
-
-    # Supplier Info
-    y = HEIGHT - 130
-    bold_text = "Name of Supplier: "
-    normal_text = "Alfaleus Technology Private Limited"
-    c.setFont("Helvetica-Bold", 10)
-    c.drawString(50, y, bold_text)
-    text_width = c.stringWidth(bold_text, "Helvetica-Bold", 10)
-    c.setFont("Helvetica", 10)
-    c.drawString(50 + text_width, y, normal_text)
-    y -= 15
-    bold_quote = "Quotation No: "
-    normal_quote_no = quote_no
-    c.setFont("Helvetica-Bold", 10)
-    c.drawString(50, y, bold_quote)
-    quote_width = c.stringWidth(bold_quote, "Helvetica-Bold", 10)
-    c.setFont("Helvetica", 10)
-    c.drawString(50 + quote_width, y, normal_quote_no)
-    c.drawRightString(WIDTH - 50, y, f"Date: {date_str}")
-    y -= 30 
-    c.drawString(50, y, "Head Office: E1, Technology Research Park, IIT Hyderabad, Kandi - 502285")
-    y -= 15
-    c.drawString(50, y, "GSTIN : 36AAQCA5270P1ZY")
-    y -= 15
-    c.drawString(50, y, "E-mail: sales@alfaleus.com")
-    y -= 15
-    c.drawString(50, y, "Phone: +91 96550 42547")
-
-    # Customer Details - MODIFIED TO HIGHLIGHT NAME
-    y -= 30
-    c.setFont("Helvetica-Bold", 11)
-    c.drawString(50, y, "Customer Details")
-    y -= 15
-    
-    # ------------------- HIGHLIGHTING IMPLEMENTATION -------------------
-    c.setFont("Helvetica-Bold", 10) 
-    bold_label = "Name : "
-    c.drawString(50, y, bold_label)
-    label_width = c.stringWidth(bold_label, "Helvetica-Bold", 10)
-
-    c.setFont("Helvetica-Bold", 10) 
-    c.drawString(50 + label_width, y, customer_name)
-    c.setFont("Helvetica", 10) # Revert to normal for subsequent lines
-    # -------------------------------------------------------------------
-
-    y -= 15
-    c.drawString(50, y, f"Email : {customer_email}")
-    y -= 15
-    address_text = address.replace('\n', '<br/>')
-    address_para = Paragraph(f"Address : {address_text}", para_style)
-    w_addr, h_addr = address_para.wrapOn(c, WIDTH - 100, HEIGHT) 
-    address_para.drawOn(c, 50, y - h_addr)
-    y -= (h_addr + 15) 
-    c.drawString(50, y, f"GSTIN : {gstin}")
-
-    # Product Details Table
-    y -= 30
-    c.setFont("Helvetica-Bold", 11)
-    c.drawString(50, y, "Product Details")
-    y -= 20
-    c.setFont("Helvetica-Bold", 10)
-    c.drawString(50, y, "S No.")
-    c.drawString(90, y, "Product Description")
-    c.drawString(350, y, "Unit")
-    c.drawString(420, y, "Rate/Unit (Rs.)") 
-    c.drawString(510, y, "Total (Rs.)") 
-    y -= 10
-    c.line(50, y, 550, y)
-    y -= 15
-    c.setFont("Helvetica", 10)
-    c.drawString(55, y, "1")
-    desc_text = product_description.replace('\n', '<br/>')
-    desc_para = Paragraph(desc_text, para_style)
-    w_desc, h_desc = desc_para.wrapOn(c, 250, HEIGHT) 
-    y_start_desc = y - (h_desc - 10) 
-    desc_para.drawOn(c, 90, y_start_desc)
-    c.drawString(350, y, unit_text) 
-    c.drawRightString(480, y, f"{rate_per_unit_exclusive:,.2f}") 
-    c.drawRightString(550, y, f"{total_exclusive_gst:,.2f}") 
-    y = y_start_desc - 15
-
-    # Total Calculations Section
-    c.setFont("Helvetica", 10)
-    c.drawString(300, y, "Sub Total:")
-    c.drawRightString(550, y, f"{total_exclusive_gst:,.2f}") 
-    y -= 20
-    c.drawString(300, y, f"Add GST ({gst_percent:.2f}%):")
-    c.drawRightString(550, y, f"{gst_amount:,.2f}")
-    y -= 10
-    c.line(300, y, 550, y)
-    y -= 20
-    c.setFont("Helvetica-Bold", 12)
-    c.drawString(300, y, "Grand Total:")
-    c.drawRightString(550, y, f"Rs. {total_inclusive_gst:,.2f}")
-    
-    # Amount in Words
-    y -= 30
-    words = num2words(round(total_inclusive_gst), lang='en_IN').title()
-    bold_value = "Value in words"
-    normal_text_words = f": Rupees {words} Only."
-    c.setFont("Helvetica-Bold", 10)
-    c.drawString(50, y, bold_value)
-    words_width = c.stringWidth(bold_value, "Helvetica-Bold", 10)
-    c.setFont("Helvetica", 10)
-    c.drawString(50 + words_width, y, normal_text_words)
-
-    # Declaration - MODIFIED TO USE SELECTED NAME
-    y -= 40
-    c.setFont("Helvetica-Bold", 10)
-    c.drawString(50, y, "Declaration:")
-    y -= 15
-    c.setFont("Helvetica", 10)
-    # Use the selected generator_name
-    c.drawString(50, y, f"On behalf of M/s Alfaleus Technology Private Limited generated by Mr. {generator_name}")
-    y -= 15
-    c.drawString(50, y, "- The particulars given above are true and correct.")
-
-    # Terms & Conditions
-    y -= 30
-    c.setFont("Helvetica-Bold", 10)
-    c.drawString(50, y, "Terms & Conditions -")
-    y -= 15
-    c.setFont("Helvetica", 10)
-    terms = [
-        f"1 - Payment terms: {payment_terms}",
-        "2 - Delivery terms: Dispatch within 30 working days from order placement."
-    ]
-    for t in terms:
-        term_para = Paragraph(t, para_style)
-        w_term, h_term = term_para.wrapOn(c, WIDTH - 100, HEIGHT)
-        term_para.drawOn(c, 50, y - h_term)
-        y -= (h_term + 5)
-
-
-    # Signature (Right-Aligned) - MODIFIED TO USE SELECTED NAME AND TITLE
-    y = BORDER_MARGIN + 80 
-    RIGHT_POS = WIDTH - 50 
-    c.drawRightString(RIGHT_POS, y, generator_name) # Signature Name
-    c.drawRightString(RIGHT_POS, y - 12, generator_title) # Signature Title
-    c.drawRightString(RIGHT_POS, y - 24, "Alfaleus Technology Pvt. Ltd, TRP, IIT Hyderabad, Kandi - 502285")
-
-    # Footer
-    c.setFont("Helvetica-Oblique", 9)
-    c.drawString(50, BORDER_MARGIN + 15,
-        "This is a computer generated quotation and does not require physical signature. "
-        "For any queries, contact info@alfaleus.com")
-
-    # ---- Save PDF to buffer ----
-    c.showPage()
-    c.save()
-    buffer.seek(0)
+    from documents import render_quotation, pdf_size_report
+    from audit import get_audit_log
+    from signing import signing_enabled, sign_pdf
+
+    profile_this_run = profiling_enabled() or st.query_params.get("profile") == "1"
+    with profile_generation(f"quotation_{quote_no}", enabled=profile_this_run) as profile_report:
+        buffer = render_quotation(
+            quote_no, date_str, customer_name, customer_email, address, gstin,
+            product_description, unit_text, rate_per_unit_exclusive, total_exclusive_gst,
+            gst_percent, total_gst_amount, grand_total_inclusive_gst, payment_terms,
+            generator_name, generator_title, line_items=line_items
+        )
+    if profile_report:
+        st.caption(f"🔬 Profile saved to `{profile_report['prof']}` (report: `{profile_report['report']}`)")
+
+    # --- OPTIONAL DIGITAL SIGNATURE (PAdES, key loaded once per process) ---
+    pdf_signed = signing_enabled()
+    if pdf_signed:
+        try:
+            buffer = BytesIO(sign_pdf(buffer.getvalue(), reason=f"Sales Quotation {quote_no}"))
+        except Exception as e:
+            st.error(f"❌ Digital signing failed: {e}")
+            st.stop()
+        st.caption("🔏 PDF digitally signed.")
+
+    pdf_size_kb, within_budget = pdf_size_report(buffer)
+    st.caption(f"Quotation PDF size: {pdf_size_kb:,.1f} KiB")
+    if not within_budget:
+        st.warning(f"⚠️ The PDF is {pdf_size_kb:,.1f} KiB, which exceeds the configured size budget.")
     
     # --- DYNAMIC CC LOGIC ---
     # 1. Get the primary CC based on the generator
@@ -434,16 +335,27 @@ if st.button("Generate Alfaleus Quotation PDF and Send Emails"):
     # --- EMAIL THE PDF COPY ---
     # 1. Send internal copy (always)
     # Note: Internal copy does not need the large CC list, but needs generator name
-    send_quotation_email(quote_no, INTERNAL_RECEIVER_EMAIL, customer_name, buffer, generator_name, is_customer_send=False)
+    internal_sent = send_quotation_email(quote_no, INTERNAL_RECEIVER_EMAIL, customer_name, buffer, generator_name, is_customer_send=False)
     
     # Reset buffer for the second email
     buffer.seek(0) 
 
     # 2. Send to customer (if checked and email provided)
+    customer_sent = None # Not requested
     if send_to_customer and customer_email:
-        send_quotation_email(quote_no, customer_email, customer_name, buffer, generator_name, final_cc_list, is_customer_send=True)
+        customer_sent = send_quotation_email(quote_no, customer_email, customer_name, buffer, generator_name, final_cc_list, is_customer_send=True)
     # --------------------------
 
+    # --- AUDIT TRAIL (append-only, group-committed) ---
+    get_audit_log().record(
+        "quotation_generated", doc_no=quote_no, generated_by=generator_name,
+        customer_name=customer_name, customer_email=customer_email, gstin=gstin,
+        amount=round(grand_total_inclusive_gst, 2),
+        pdf_sha256=hashlib.sha256(buffer.getvalue()).hexdigest(),
+        signed=pdf_signed,
+        internal_email_sent=internal_sent, customer_email_sent=customer_sent
+    )
+
     # ---- Download Button ----
     st.download_button(
         label="📄 Download Quotation PDF",
@@ -0,0 +1,279 @@
+"""Append-only audit journal of generated quotations and receipts.
+
+Every generated document is recorded as one JSON line: who generated it, for
+whom, for how much, the PDF's SHA-256 and whether each email went out.
+
+Writes are group-committed: records are buffered in memory and a background
+thread appends them with a single write() and a single fsync() per batch. A
+batch is committed as soon as AUDIT_GROUP_SIZE records are waiting or the
+oldest one has waited AUDIT_MAX_DELAY_S, so a crash loses at most that many
+records / that much time, while batch runs don't pay one fsync per document.
+A batch that fails to write (disk full, ...) is logged and kept at the front
+of the queue, and the flusher retries it after AUDIT_MAX_DELAY_S.
+
+Rotation: once the live file exceeds AUDIT_ROTATE_BYTES it is renamed to
+audit-<timestamp>.jsonl. Older rotated segments are compacted with gzip in a
+background thread. Both apps may share one log, so rotation and compaction run
+under a lock file and a segment is only replaced by a complete .gz. Records
+are never deleted or rewritten. read_audit() reads all segments in order, and
+skips whole segments that end before `since`.
+"""
+import os
+import io
+import json
+import glob
+import gzip
+import atexit
+import logging
+import shutil
+import threading
+import time
+from datetime import datetime
+
+from file_lock import file_lock
+
+AUDIT_LOG_PATH = os.getenv("ALFA_AUDIT_LOG", os.path.join("audit", "audit.jsonl"))
+AUDIT_GROUP_SIZE = int(os.getenv("ALFA_AUDIT_GROUP_SIZE", "64"))
+AUDIT_MAX_DELAY_S = float(os.getenv("ALFA_AUDIT_MAX_DELAY_S", "1.0"))
+AUDIT_ROTATE_BYTES = int(os.getenv("ALFA_AUDIT_ROTATE_BYTES", str(16 * 1024 * 1024)))
+
+_SEGMENT_TIME_FORMAT = "%Y%m%dT%H%M%S%f"
+
+logger = logging.getLogger(__name__)
+
+
+class AuditLog:
+    """Buffered, group-committed JSON-lines journal. Use get_audit_log() in the apps."""
+
+    def __init__(self, path=AUDIT_LOG_PATH, group_size=AUDIT_GROUP_SIZE,
+                 max_delay_s=AUDIT_MAX_DELAY_S, rotate_bytes=AUDIT_ROTATE_BYTES):
+        self.path = path
+        self.group_size = group_size
+        self.max_delay_s = max_delay_s
+        self.rotate_bytes = rotate_bytes
+        self._pending = []
+        self._oldest = None
+        self._cond = threading.Condition()
+        # Keeps batches in order when flush() and the flusher thread commit at once
+        self._commit_lock = threading.Lock()
+        self._closed = False
+        self.last_error = None  # error of the last failed commit, until a commit succeeds
+        self._compactor = None
+        self._flusher = threading.Thread(target=self._run, name="alfa-audit-flusher", daemon=True)
+        self._flusher.start()
+
+    def record(self, event, **fields):
+        """Queues one audit record; it is durable after the next group commit."""
+        entry = {"ts": datetime.now().astimezone().isoformat(timespec="milliseconds"), "event": event}
+        entry.update(fields)
+        line = json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n"
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("audit log is closed")
+            if not self._flusher.is_alive():
+                raise RuntimeError(f"audit flusher has stopped; {len(self._pending)} records are not on disk")
+            if not self._pending:
+                # Starts the flusher's max-delay timer for this batch
+                self._oldest = time.monotonic()
+                self._cond.notify()
+            self._pending.append(line)
+            if len(self._pending) >= self.group_size:
+                self._cond.notify()
+
+    def flush(self):
+        """Commits everything queued so far and returns once it is on disk.
+
+        Raises the write error if the commit fails; the records stay queued.
+        """
+        with self._cond:
+            batch, self._pending = self._pending, []
+        try:
+            self._commit(batch)
+        except Exception:
+            self._requeue(batch)
+            raise
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._flusher.join()
+        self.flush()
+        if self._compactor is not None:
+            self._compactor.join()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._closed:
+                    if len(self._pending) >= self.group_size:
+                        break
+                    if self._pending:
+                        remaining = self.max_delay_s - (time.monotonic() - self._oldest)
+                        if remaining <= 0:
+                            break
+                        self._cond.wait(remaining)
+                    else:
+                        self._cond.wait()
+                if self._closed:
+                    return
+                batch, self._pending = self._pending, []
+            try:
+                self._commit(batch)
+            except Exception:
+                logger.exception("Audit log: could not write %d records to %s; retrying", len(batch), self.path)
+                self._requeue(batch)
+                self._back_off()
+
+    def _requeue(self, batch):
+        """Puts a batch that failed to commit back in front of the newer records."""
+        with self._cond:
+            self._pending[:0] = batch
+            if self._pending:
+                self._oldest = time.monotonic()
+
+    def _back_off(self):
+        with self._cond:
+            deadline = time.monotonic() + self.max_delay_s
+            while not self._closed and time.monotonic() < deadline:
+                self._cond.wait(deadline - time.monotonic())
+
+    def _commit(self, batch):
+        if not batch:
+            return
+        with self._commit_lock:
+            try:
+                self._append(batch)
+            except Exception as e:
+                self.last_error = e
+                raise
+            self.last_error = None
+
+    def _append(self, batch):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        data = "".join(batch).encode("utf-8")
+        # One O_APPEND write per batch keeps batches from concurrent processes whole
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o640)
+        try:
+            os.write(fd, data)
+            os.fsync(fd)
+            size = os.fstat(fd).st_size
+        finally:
+            os.close(fd)
+        if self.rotate_bytes and size >= self.rotate_bytes:
+            self._rotate()
+
+    def _rotate(self):
+        stem, ext = os.path.splitext(self.path)
+        with file_lock(self.path):
+            try:
+                if os.path.getsize(self.path) < self.rotate_bytes:
+                    return  # another process rotated it first
+                segment = f"{stem}-{datetime.now().strftime(_SEGMENT_TIME_FORMAT)}{ext}"
+                os.replace(self.path, segment)
+            except FileNotFoundError:
+                return
+        # Compaction can take a while on a large segment; keep it off the commit path
+        if self._compactor is None or not self._compactor.is_alive():
+            self._compactor = threading.Thread(target=self._compact, name="alfa-audit-compactor", daemon=True)
+            self._compactor.start()
+
+    def _compact(self):
+        try:
+            compact_segments(self.path)
+        except Exception:
+            logger.exception("Audit log: could not compact the segments of %s", self.path)
+
+
+def _segments(path):
+    """Rotated segments of `path` (oldest first), followed by the live file."""
+    stem, ext = os.path.splitext(path)
+    compacted = glob.glob(f"{glob.escape(stem)}-*{ext}.gz")
+    # A plain segment next to its .gz was compacted but not yet removed
+    plain = [p for p in glob.glob(f"{glob.escape(stem)}-*{ext}") if p + ".gz" not in compacted]
+    rotated = plain + compacted
+    rotated.sort(key=lambda p: os.path.basename(p).split(".")[0])
+    return rotated + ([path] if os.path.exists(path) else [])
+
+
+def _segment_end(segment_path):
+    """Rotation time encoded in a segment name, or None for the live file."""
+    name = os.path.basename(segment_path).split(".")[0]
+    try:
+        return datetime.strptime(name.rsplit("-", 1)[1], _SEGMENT_TIME_FORMAT)
+    except (IndexError, ValueError):
+        return None
+
+
+def compact_segments(path=AUDIT_LOG_PATH):
+    """Gzips rotated segments, except the newest one, which may still get a late batch.
+
+    Safe to run from several processes at once: it holds the log's lock file,
+    a .gz only appears once complete, and a segment already compacted (or
+    removed) by someone else is skipped.
+    """
+    stem, ext = os.path.splitext(path)
+    with file_lock(path):
+        plain = sorted(glob.glob(f"{glob.escape(stem)}-*{ext}"))
+        for segment in plain[:-1]:
+            target = segment + ".gz"
+            if not os.path.exists(target):
+                try:
+                    src = open(segment, "rb")
+                except FileNotFoundError:
+                    continue  # compacted by another process
+                with src, open(target + ".tmp", "wb") as raw:
+                    with gzip.GzipFile(fileobj=raw, mode="wb") as dst:
+                        shutil.copyfileobj(src, dst)
+                    raw.flush()
+                    os.fsync(raw.fileno())
+                os.replace(target + ".tmp", target)
+            try:
+                os.remove(segment)
+            except FileNotFoundError:
+                pass
+
+
+def read_audit(path=AUDIT_LOG_PATH, since=None, event=None, contains=None):
+    """Yields audit records (dicts) oldest first across all segments.
+
+    since: datetime; segments rotated before it are skipped without being opened.
+    event: only records with this event name.
+    contains: substring (e.g. a document number) checked on the raw line before parsing.
+    """
+    if since is not None:
+        # Naive datetimes are local time, like the segment names
+        since = since.astimezone()
+        since_local = since.replace(tzinfo=None)
+    for segment in _segments(path):
+        end = _segment_end(segment)
+        if since is not None and end is not None and end < since_local:
+            continue
+        opener = gzip.open if segment.endswith(".gz") else open
+        with opener(segment, "rb") as raw:
+            for line in io.TextIOWrapper(raw, encoding="utf-8"):
+                if contains is not None and contains not in line:
+                    continue
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # torn final line after a crash
+                if event is not None and entry.get("event") != event:
+                    continue
+                if since is not None and datetime.fromisoformat(entry["ts"]) < since:
+                    continue
+                yield entry
+
+
+_audit_log = None
+_audit_lock = threading.Lock()
+
+
+def get_audit_log():
+    """Returns the process-wide AuditLog, flushed automatically at exit."""
+    global _audit_log
+    with _audit_lock:
+        if _audit_log is None:
+            _audit_log = AuditLog()
+            atexit.register(_audit_log.close)
+        return _audit_log
@@ -0,0 +1,355 @@
+"""Bulk payment receipts from a bank statement CSV.
+
+parse_statement() reads the credits (UPI, NEFT/RTGS/IMPS, cheque, cash) out of
+a statement export, parse_customers() reads the customer list, and reconcile()
+matches each credit to a customer:
+
+1. by reference: the customer's `reference` (UTR, UPI ID, account name, ...)
+   appears in the credit's reference or narration;
+2. otherwise by amount: the credit equals the customer's `expected_amount`.
+
+Both lookups go through dicts built once per import (CustomerIndex), so a
+statement is reconciled in one pass however long the customer list is. A
+credit with exactly one candidate is 'matched'; several candidates make it
+'ambiguous' and none 'unmatched' -- those two need a person to pick the
+customer before a receipt is issued. A credit whose reference already has a
+receipt in the audit log (an overlapping statement imported again) is
+'already issued' and is not offered for a second one.
+
+generate_receipts() takes the confirmed (credit, customer) pairs, reserves
+their receipt numbers as one block and renders the PDFs across worker
+processes.
+"""
+import csv
+import io
+import os
+import re
+import zipfile
+from collections import namedtuple
+from datetime import datetime
+
+from worker_pool import map_in_processes
+
+BULK_WORKERS = int(os.getenv("ALFA_BULK_WORKERS", str(os.cpu_count() or 1)))
+# Below this many receipts the process pool costs more than it saves
+BULK_PARALLEL_MIN = int(os.getenv("ALFA_BULK_PARALLEL_MIN", "8"))
+
+MATCHED, AMBIGUOUS, UNMATCHED, ALREADY_ISSUED = "matched", "ambiguous", "unmatched", "already issued"
+
+Credit = namedtuple("Credit", "row date amount reference narration mode")
+Customer = namedtuple("Customer", "name email address gstin reference expected_amount description")
+Match = namedtuple("Match", "credit customer status basis candidates")
+BulkReceipt = namedtuple("BulkReceipt", "receipt_no credit customer pdf")
+
+# Header spellings used by the usual Indian bank exports, compared ignoring case,
+# spaces and punctuation ("Chq./Ref.No." matches "chq ref no")
+_DATE_HEADERS = ("date", "txn date", "transaction date", "tran date", "value date", "posting date")
+_CREDIT_HEADERS = ("credit", "credit amount", "deposit", "deposits", "deposit amt", "deposit amount", "cr amount", "amount (cr)")
+_AMOUNT_HEADERS = ("amount", "transaction amount", "txn amount")
+_TYPE_HEADERS = ("cr/dr", "dr/cr", "type", "transaction type", "debit/credit")
+_REFERENCE_HEADERS = ("utr", "utr no", "reference", "reference no", "ref no", "chq/ref no", "cheque/ref no",
+                      "ref no/cheque no", "transaction id", "txn id")
+_NARRATION_HEADERS = ("narration", "description", "particulars", "remarks", "transaction remarks", "details")
+
+_DATE_FORMATS = ("%d/%m/%Y", "%d/%m/%y", "%d-%m-%Y", "%d-%m-%y", "%d.%m.%Y", "%Y-%m-%d", "%d %b %Y", "%d-%b-%Y", "%d-%b-%y")
+
+# Checked in order against the narration; the first hit decides the mode of payment
+_MODE_PATTERNS = (
+    (re.compile(r"\bUPI\b", re.I), "UPI"),
+    (re.compile(r"\b(NEFT|RTGS|IMPS)\b", re.I), "Bank Transfer"),
+    (re.compile(r"\b(CHQ|CHEQUE|CLG|CLEARING)\b", re.I), "Cheque"),
+    (re.compile(r"\bDD\b|DEMAND DRAFT", re.I), "Demand Draft"),
+    (re.compile(r"\bCASH\b", re.I), "Cash"),
+)
+
+# UTRs, UPI IDs (name@bank), account names; short tokens are too common to identify anyone
+_TOKEN = re.compile(r"[A-Za-z0-9@._-]+")
+_MIN_TOKEN_LENGTH = 4
+
+
+class StatementError(ValueError):
+    """Raised when a statement or customer CSV cannot be understood."""
+
+
+def _header_key(title):
+    return re.sub(r"[^a-z0-9]", "", title.lower())
+
+
+def _find_column(header, names):
+    keys = {_header_key(name) for name in names}
+    for index, title in enumerate(header):
+        if _header_key(title) in keys:
+            return index
+    return None
+
+
+def _parse_amount(text):
+    text = (text or "").replace(",", "").replace("Rs.", "").replace("INR", "").replace("₹", "").strip()
+    if not text or text == "-":
+        return None
+    try:
+        return round(float(text), 2)
+    except ValueError:
+        return None
+
+
+def _parse_date(text):
+    text = (text or "").strip()
+    for fmt in _DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def _mode_of_payment(narration):
+    for pattern, mode in _MODE_PATTERNS:
+        if pattern.search(narration):
+            return mode
+    return "Bank Transfer"
+
+
+def _normalize(token):
+    return token.strip(" ._-").upper()
+
+
+def _tokens(*texts):
+    found = set()
+    for text in texts:
+        for token in _TOKEN.findall(text or ""):
+            token = _normalize(token)
+            if len(token) >= _MIN_TOKEN_LENGTH:
+                found.add(token)
+    return found
+
+
+def _amount_key(amount):
+    # Whole paise, so 11000.0 and 11000.00 from different sources hit the same bucket
+    return int(round(amount * 100))
+
+
+def parse_statement(text):
+    """Returns the credits in a bank statement CSV, in statement order.
+
+    Preamble lines above the column headers (account number, period, ...) are
+    skipped. Credits are read from a credit/deposit column, or from an amount
+    column paired with a Cr/Dr column. Debits and rows without a date are ignored.
+    """
+    rows = list(csv.reader(io.StringIO(text)))
+    for header_row, header in enumerate(rows):
+        date_col = _find_column(header, _DATE_HEADERS)
+        credit_col = _find_column(header, _CREDIT_HEADERS)
+        amount_col = _find_column(header, _AMOUNT_HEADERS)
+        type_col = _find_column(header, _TYPE_HEADERS)
+        if date_col is not None and (credit_col is not None or (amount_col is not None and type_col is not None)):
+            break
+    else:
+        raise StatementError("No header row with a date and a credit (or amount and Cr/Dr) column was found.")
+    reference_col = _find_column(header, _REFERENCE_HEADERS)
+    narration_col = _find_column(header, _NARRATION_HEADERS)
+
+    def cell(row, col):
+        return row[col].strip() if col is not None and col < len(row) else ""
+
+    credits = []
+    for row_no, row in enumerate(rows[header_row + 1:], start=header_row + 2):
+        date = _parse_date(cell(row, date_col))
+        if date is None:
+            continue  # blank lines, opening/closing balance and totals rows
+        if credit_col is not None:
+            amount = _parse_amount(cell(row, credit_col))
+        elif cell(row, type_col).upper().startswith("C"):
+            amount = _parse_amount(cell(row, amount_col))
+        else:
+            amount = None
+        if not amount or amount <= 0:
+            continue
+        narration = cell(row, narration_col)
+        credits.append(Credit(
+            row=row_no, date=date, amount=amount,
+            reference=cell(row, reference_col), narration=narration,
+            mode=_mode_of_payment(narration),
+        ))
+    return credits
+
+
+def parse_customers(text):
+    """Reads the customer list CSV.
+
+    Columns: name (required), email, address, gstin, reference, expected_amount,
+    description. `reference` holds identifiers without spaces (UTR, UPI ID,
+    account number, a payer's name as the bank prints it in one word); several
+    are separated by ';'.
+    """
+    reader = csv.DictReader(io.StringIO(text))
+    if not reader.fieldnames or "name" not in [f.strip().lower() for f in reader.fieldnames]:
+        raise StatementError("The customer CSV needs at least a 'name' column.")
+    customers = []
+    for raw in reader:
+        row = {(k or "").strip().lower(): (v or "").strip() for k, v in raw.items()}
+        if not row.get("name"):
+            continue
+        customers.append(Customer(
+            name=row["name"], email=row.get("email", ""), address=row.get("address", ""),
+            gstin=row.get("gstin") or "Nil", reference=row.get("reference", ""),
+            expected_amount=_parse_amount(row.get("expected_amount")),
+            description=row.get("description", ""),
+        ))
+    return customers
+
+
+class CustomerIndex:
+    """Reference-token and amount lookups over a customer list, built once per import."""
+
+    def __init__(self, customers):
+        self.by_reference = {}
+        self.by_amount = {}
+        for customer in customers:
+            for reference in customer.reference.split(";"):
+                key = _normalize(reference)
+                if len(key) >= _MIN_TOKEN_LENGTH:
+                    self.by_reference.setdefault(key, []).append(customer)
+            if customer.expected_amount:
+                self.by_amount.setdefault(_amount_key(customer.expected_amount), []).append(customer)
+
+    def match(self, credit):
+        """Returns the Match for one credit."""
+        candidates = []
+        for token in _tokens(credit.reference, credit.narration):
+            for customer in self.by_reference.get(token, ()):
+                if customer not in candidates:
+                    candidates.append(customer)
+        basis = "reference"
+        if not candidates:
+            candidates = list(self.by_amount.get(_amount_key(credit.amount), ()))
+            basis = "amount"
+        if len(candidates) == 1:
+            return Match(credit, candidates[0], MATCHED, basis, tuple(candidates))
+        if candidates:
+            return Match(credit, None, AMBIGUOUS, basis, tuple(candidates))
+        return Match(credit, None, UNMATCHED, None, ())
+
+
+def _reference_key(reference):
+    return " ".join((reference or "").split()).upper()
+
+
+def issued_references(records):
+    """Maps the reference of every issued receipt to its number.
+
+    records: "receipt_generated" audit records, e.g. read_audit(event="receipt_generated").
+    """
+    issued = {}
+    for record in records:
+        key = _reference_key(record.get("reference_details"))
+        if key and key != "N/A":
+            issued.setdefault(key, record.get("doc_no"))
+    return issued
+
+
+def reconcile(credits, customers, issued=None):
+    """Matches every credit against the customer list; returns Matches in statement order.
+
+    Credits whose reference is in `issued` (see issued_references()) are
+    'already issued', with the existing receipt number as the basis.
+    """
+    index = CustomerIndex(customers)
+    matches = []
+    for credit in credits:
+        match = index.match(credit)
+        receipt_no = issued.get(_reference_key(credit.reference or credit.narration)) if issued else None
+        if receipt_no:
+            match = match._replace(status=ALREADY_ISSUED, basis=receipt_no)
+        matches.append(match)
+    return matches
+
+
+def confirm(matches, choices):
+    """Splits reviewed matches into (confirmed (credit, customer) pairs, skipped Matches).
+
+    choices holds one (issue, customer) per match, as picked in the review;
+    customer is None when none was picked. Credits already issued are always
+    skipped, whatever the review says.
+    """
+    confirmed, skipped = [], []
+    for m, (issue, customer) in zip(matches, choices):
+        if issue and customer is not None and m.status != ALREADY_ISSUED:
+            confirmed.append((m.credit, customer))
+        else:
+            skipped.append(m)
+    return confirmed, skipped
+
+
+def _receipt_fields(receipt_no, credit, customer, generator_name, generator_title, default_description):
+    return dict(
+        receipt_no=receipt_no, receipt_date_str=credit.date.strftime("%d/%m/%Y"),
+        customer_name=customer.name, customer_email=customer.email,
+        address=customer.address, gstin=customer.gstin,
+        product_description=customer.description or default_description,
+        mode_of_payment=credit.mode,
+        reference_details=credit.reference or credit.narration or "N/A",
+        amount_received=credit.amount,
+        generator_name=generator_name, generator_title=generator_title,
+    )
+
+
+def _render_job(fields):
+    from documents import render_receipt
+    return render_receipt(**fields).getvalue()
+
+
+def generate_receipts(confirmed, generator_name, generator_title, default_description, max_workers=None):
+    """Renders a receipt per confirmed (credit, customer) pair and returns BulkReceipts.
+
+    Receipt numbers are reserved as one consecutive block and handed out in
+    statement order (by date, then row). Rendering runs across worker
+    processes once the batch is large enough to pay for them.
+    """
+    from receipt_numbers import allocate_receipt_numbers, format_receipt_number
+
+    confirmed = sorted(confirmed, key=lambda pair: (pair[0].date, pair[0].row))
+    counters = allocate_receipt_numbers(len(confirmed))
+    receipt_nos = [format_receipt_number(credit.date, counter)
+                   for (credit, _), counter in zip(confirmed, counters)]
+    jobs = [_receipt_fields(receipt_no, credit, customer, generator_name, generator_title, default_description)
+            for receipt_no, (credit, customer) in zip(receipt_nos, confirmed)]
+
+    workers = min(max_workers or BULK_WORKERS, len(jobs))
+    if workers <= 1 or len(jobs) < BULK_PARALLEL_MIN:
+        pdfs = [_render_job(fields) for fields in jobs]
+    else:
+        pdfs = map_in_processes(_render_job, jobs, workers)
+    return [BulkReceipt(receipt_no, credit, customer, pdf)
+            for receipt_no, (credit, customer), pdf in zip(receipt_nos, confirmed, pdfs)]
+
+
+def receipt_file_name(receipt_no):
+    return f"Alfaleus_Receipt_{receipt_no.replace('/', '_')}.pdf"
+
+
+def summary_csv(receipts, skipped=()):
+    """One CSV covering the whole import: issued receipts, then credits left without one."""
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(["status", "receipt_no", "date", "customer", "email", "amount", "mode", "reference", "statement_row"])
+    for r in receipts:
+        writer.writerow(["issued", r.receipt_no, r.credit.date.strftime("%d/%m/%Y"), r.customer.name,
+                         r.customer.email, f"{r.credit.amount:.2f}", r.credit.mode, r.credit.reference, r.credit.row])
+    for m in skipped:
+        receipt_no = m.basis if m.status == ALREADY_ISSUED else ""
+        writer.writerow([m.status, receipt_no, m.credit.date.strftime("%d/%m/%Y"), "", "", f"{m.credit.amount:.2f}",
+                         m.credit.mode, m.credit.reference or m.credit.narration, m.credit.row])
+    return out.getvalue()
+
+
+def receipts_zip(receipts, summary=None):
+    """Zips the receipt PDFs (and the summary CSV, if given) into one download."""
+    out = io.BytesIO()
+    # PDFs are already compressed; storing them keeps zipping instant
+    with zipfile.ZipFile(out, "w", compression=zipfile.ZIP_STORED) as zf:
+        for r in receipts:
+            zf.writestr(receipt_file_name(r.receipt_no), r.pdf)
+        if summary is not None:
+            zf.writestr("summary.csv", summary)
+    return out.getvalue()
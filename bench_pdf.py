@@ -0,0 +1,99 @@
+"""Benchmark: PDF size and render time, default canvas vs compact mode.
+
+The baseline is what the app wrote before compact mode: a stock
+canvas.Canvas(buffer, pagesize=A4), which already compresses page streams
+(rl_config.pageCompression = 1) but ASCII85-encodes them and redraws the
+letterhead on every page. Both runs are non-deterministic, so only the
+compact setting differs.
+
+Usage: python bench_pdf.py [iterations]
+"""
+import sys
+import time
+
+from documents import render_quotation, render_receipt, pdf_size_report
+
+SAMPLE_QUOTATION = dict(
+    quote_no="ALF/25-26/10/0042",
+    date_str="19/10/2025",
+    customer_name="Kauvery Eye Hospital",
+    customer_email="info@kauveryhospital.com",
+    address="No. 81, TTK Road, Alwarpet\nChennai, Tamil Nadu - 600018",
+    gstin="33AAACK1234F1Z5",
+    product_description=(
+        "Intelligent Vision Analyser Plus (iVA+)\n"
+        "4th Generation - VR based visual field testing device - complete kit "
+        "with 1 year CMC warranty, including 1 unit Lens kit, 1 unit Lens holder (custom build)"
+    ),
+    unit_text="1 Nos",
+    rate_per_unit_exclusive=285714.29,
+    total_exclusive_gst=285714.29,
+    gst_percent=5.0,
+    gst_amount=14285.71,
+    total_inclusive_gst=300000.00,
+    payment_terms="Rs. 11,000 booking amount and balance payment upon installation.",
+    generator_name="Kiran Shukla",
+    generator_title="Head of Sales",
+)
+
+SAMPLE_RECEIPT = dict(
+    receipt_no="REC/191025/0100",
+    receipt_date_str="19/10/2025",
+    customer_name="Kauvery Eye Hospital",
+    customer_email="info@kauveryhospital.com",
+    address="No. 81, TTK Road, Alwarpet\nChennai, Tamil Nadu - 600018",
+    gstin="33AAACK1234F1Z5",
+    product_description=(
+        "Booking advance for Intelligent Vision Analyser Plus (iVA+)\n"
+        "4th Generation - VR based visual field testing device - complete kit"
+    ),
+    mode_of_payment="UPI",
+    reference_details="UTR 412345678901",
+    amount_received=11000.00,
+    generator_name="Kiran Shukla",
+    generator_title="Head of Sales",
+)
+
+# Long quotation: 40 accessory rows (Rs. 10,000 each incl. 5% GST) and long terms,
+# flowing over several pages
+SAMPLE_LONG_QUOTATION = dict(
+    SAMPLE_QUOTATION,
+    gst_amount=14285.71 + 40 * 476.19,
+    total_inclusive_gst=300000.00 + 40 * 10000.00,
+    payment_terms=" ".join(["Rs. 11,000 booking amount and balance payment upon installation."] * 12),
+    line_items=[
+        (f"Accessory kit {i % 4 + 1} - lens set with custom holder, carry case and calibration card",
+         "1 Nos", 9523.81, 9523.81)
+        for i in range(40)
+    ],
+)
+
+
+def bench(render, kwargs, compact, iterations):
+    """Returns (size in KiB, mean render time in ms) for one document type and mode."""
+    render(**kwargs, compact=compact, deterministic=False)  # warm-up: font metrics, style sheet
+    start = time.perf_counter()
+    for _ in range(iterations):
+        buffer = render(**kwargs, compact=compact, deterministic=False)
+    elapsed_ms = (time.perf_counter() - start) * 1000 / iterations
+    size_kb, _ = pdf_size_report(buffer, budget_kb=0)
+    return size_kb, elapsed_ms
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    print(f"{'document':<16} {'mode':<8} {'size (KiB)':>11} {'render (ms)':>12}")
+    for name, render, kwargs in (
+        ("quotation", render_quotation, SAMPLE_QUOTATION),
+        ("receipt", render_receipt, SAMPLE_RECEIPT),
+        ("quotation-long", render_quotation, SAMPLE_LONG_QUOTATION),
+    ):
+        base_size, base_ms = bench(render, kwargs, False, iterations)
+        compact_size, compact_ms = bench(render, kwargs, True, iterations)
+        print(f"{name:<16} {'default':<8} {base_size:>11.2f} {base_ms:>12.3f}")
+        print(f"{name:<16} {'compact':<8} {compact_size:>11.2f} {compact_ms:>12.3f}"
+              f"  ({(1 - compact_size / base_size) * 100:.1f}% smaller)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Startup benchmark: import cost, time-to-first-paint and time-to-first-PDF.
+
+Every measurement runs in a fresh interpreter so nothing is cached between them:
+
+- import cost of each app's top-level imports, from `python -X importtime`
+- time-to-first-paint: the first Streamlit run of app.py / receipt.py
+  (streamlit itself is imported before the clock starts)
+- time-to-first-PDF: importing documents and rendering the first quotation / receipt
+
+Usage: python bench_startup.py [runs]
+"""
+import ast
+import os
+import re
+import subprocess
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+APPS = ("app.py", "receipt.py")
+
+FIRST_PAINT = """
+import os, sys, time
+os.environ["ALFA_PREWARM"] = "0"
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file({script!r}, default_timeout=60)
+start = time.perf_counter()
+at.run()
+print((time.perf_counter() - start) * 1000)
+"""
+
+FIRST_PDF = """
+import time
+start = time.perf_counter()
+import documents
+from bench_pdf import SAMPLE_QUOTATION, SAMPLE_RECEIPT
+documents.{render}(**{sample})
+print((time.perf_counter() - start) * 1000)
+"""
+
+
+def top_level_imports(script):
+    """Module names imported at the top level of a script."""
+    with open(os.path.join(HERE, script)) as f:
+        tree = ast.parse(f.read())
+    names = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            names.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module:
+            names.append(node.module)
+    return names
+
+
+def import_costs(modules):
+    """Returns {module: cumulative import time in ms} from `python -X importtime`."""
+    code = "\n".join(f"import {name}" for name in modules)
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                            cwd=HERE, capture_output=True, text=True, check=True)
+    costs = {}
+    for line in result.stderr.splitlines():
+        match = re.match(r"import time:\s+\d+ \|\s+(\d+) \| (\S+)", line)
+        # Unindented entries are the modules the script itself pulls in
+        if match:
+            costs[match.group(2)] = int(match.group(1)) / 1000
+    return {name: costs.get(name, 0.0) for name in modules}
+
+
+def timed(code, runs):
+    """Median of `runs` fresh-interpreter timings printed by `code`, in ms."""
+    samples = []
+    for _ in range(runs):
+        result = subprocess.run([sys.executable, "-c", code], cwd=HERE,
+                                capture_output=True, text=True, check=True)
+        samples.append(float(result.stdout.strip().splitlines()[-1]))
+    samples.sort()
+    return samples[len(samples) // 2]
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    for script in APPS:
+        costs = import_costs(top_level_imports(script))
+        print(f"{script}: top-level imports {sum(costs.values()):,.1f} ms")
+        for name, ms in sorted(costs.items(), key=lambda item: -item[1])[:8]:
+            print(f"    {name:<28} {ms:>8.1f} ms")
+    print()
+    for script in APPS:
+        print(f"time-to-first-paint {script:<11} {timed(FIRST_PAINT.format(script=script), runs):>8.1f} ms")
+    for render, sample in (("render_quotation", "SAMPLE_QUOTATION"), ("render_receipt", "SAMPLE_RECEIPT")):
+        print(f"time-to-first-PDF   {render:<16} {timed(FIRST_PDF.format(render=render, sample=sample), runs):>8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
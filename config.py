@@ -0,0 +1,147 @@
+"""Shared configuration for the quotation and receipt apps.
+
+Staff, CC lists, SMTP settings, company letterhead and price bounds live in
+config.toml. get_config() keeps one parsed copy per process and only re-reads
+the file when its modification time changes, so edits apply on the next page
+interaction without a restart and unchanged files cost a single stat() call.
+"""
+import os
+import threading
+from collections import namedtuple
+
+try:
+    import tomllib
+except ModuleNotFoundError:  # Python < 3.11
+    import tomli as tomllib
+
+CONFIG_PATH = os.getenv("ALFA_CONFIG", os.path.join(os.path.dirname(os.path.abspath(__file__)), "config.toml"))
+
+COMPANY_KEYS = (
+    "name", "short_name", "registered_office", "head_office", "signature_address",
+    "cin", "gstin", "contact_email", "sales_email", "phone",
+)
+
+AppConfig = namedtuple("AppConfig", [
+    "generator_details",    # name -> title, in display order
+    "primary_cc_mapping",   # name -> email
+    "secondary_cc_emails",
+    "smtp_server",
+    "smtp_port",
+    "company",              # letterhead strings, see COMPANY_KEYS
+    "rate_per_unit_min",
+    "rate_per_unit_max",
+])
+
+
+def env_flag(name, default=False):
+    """Reads an on/off environment switch: 1/true/yes/on (any case) mean on."""
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+class ConfigError(ValueError):
+    """Raised when config.toml is missing, unreadable or fails validation."""
+
+
+_lock = threading.Lock()
+_cache = {"mtime": None, "config": None}
+
+
+def _require(table, key, kind, where):
+    if key not in table:
+        raise ConfigError(f"{where}: missing '{key}'")
+    value = table[key]
+    if kind is float and isinstance(value, int) and not isinstance(value, bool):
+        value = float(value)
+    if not isinstance(value, kind) or isinstance(value, bool):
+        raise ConfigError(f"{where}: '{key}' must be {kind.__name__}, got {type(value).__name__}")
+    if kind is str and not value.strip():
+        raise ConfigError(f"{where}: '{key}' must not be empty")
+    return value
+
+
+def _require_email(value, where):
+    if "@" not in value:
+        raise ConfigError(f"{where}: '{value}' is not an email address")
+    return value
+
+
+def parse_config(data):
+    """Validates the parsed TOML document and builds an AppConfig from it."""
+    company_table = _require(data, "company", dict, "config")
+    company = {key: _require(company_table, key, str, "[company]") for key in COMPANY_KEYS}
+    _require_email(company["contact_email"], "[company] contact_email")
+    _require_email(company["sales_email"], "[company] sales_email")
+
+    email_table = _require(data, "email", dict, "config")
+    smtp_server = _require(email_table, "smtp_server", str, "[email]")
+    smtp_port = _require(email_table, "smtp_port", int, "[email]")
+    if not 0 < smtp_port < 65536:
+        raise ConfigError(f"[email]: smtp_port {smtp_port} is out of range")
+    secondary_cc = _require(email_table, "secondary_cc", list, "[email]")
+    for address in secondary_cc:
+        if not isinstance(address, str):
+            raise ConfigError("[email]: secondary_cc must be a list of email addresses")
+        _require_email(address, "[email] secondary_cc")
+
+    pricing = _require(data, "pricing", dict, "config")
+    rate_min = _require(pricing, "rate_per_unit_min", float, "[pricing]")
+    rate_max = _require(pricing, "rate_per_unit_max", float, "[pricing]")
+    if not 0 < rate_min <= rate_max:
+        raise ConfigError("[pricing]: need 0 < rate_per_unit_min <= rate_per_unit_max")
+
+    generators = _require(data, "generators", list, "config")
+    if not generators:
+        raise ConfigError("[[generators]]: at least one generator is required")
+    generator_details, primary_cc_mapping = {}, {}
+    for index, generator in enumerate(generators, start=1):
+        where = f"[[generators]] #{index}"
+        if not isinstance(generator, dict):
+            raise ConfigError(f"{where}: must be a table")
+        name = _require(generator, "name", str, where)
+        if name in generator_details:
+            raise ConfigError(f"{where}: duplicate generator '{name}'")
+        generator_details[name] = _require(generator, "title", str, where)
+        primary_cc_mapping[name] = _require_email(_require(generator, "email", str, where), where)
+
+    return AppConfig(
+        generator_details=generator_details,
+        primary_cc_mapping=primary_cc_mapping,
+        secondary_cc_emails=list(secondary_cc),
+        smtp_server=smtp_server,
+        smtp_port=smtp_port,
+        company=company,
+        rate_per_unit_min=rate_min,
+        rate_per_unit_max=rate_max,
+    )
+
+
+def load_config(path=CONFIG_PATH):
+    """Reads and validates a config file, bypassing the cache."""
+    try:
+        with open(path, "rb") as f:
+            data = tomllib.load(f)
+    except OSError as e:
+        raise ConfigError(f"Cannot read config file {path}: {e}") from e
+    except tomllib.TOMLDecodeError as e:
+        raise ConfigError(f"Invalid TOML in {path}: {e}") from e
+    return parse_config(data)
+
+
+def get_config():
+    """Returns the process-wide AppConfig, reloading it only if config.toml changed.
+
+    The same AppConfig object is returned until the file changes, so callers
+    can cache work derived from it by identity.
+    """
+    try:
+        mtime = os.stat(CONFIG_PATH).st_mtime_ns
+    except OSError as e:
+        raise ConfigError(f"Cannot read config file {CONFIG_PATH}: {e}") from e
+    with _lock:
+        if _cache["config"] is None or _cache["mtime"] != mtime:
+            _cache["config"] = load_config(CONFIG_PATH)
+            _cache["mtime"] = mtime
+        return _cache["config"]
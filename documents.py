@@ -0,0 +1,406 @@
+"""PDF rendering for Alfaleus quotations and receipts.
+
+The Streamlit apps collect the inputs; the functions here turn them into a
+finished PDF held in an in-memory buffer.
+"""
+import io
+import os
+import threading
+from collections import namedtuple
+from contextlib import contextmanager
+from functools import lru_cache
+
+from reportlab import rl_config
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas
+
+from num2words import num2words
+
+from config import get_config, env_flag
+from layout import (SetY, Move, Font, Fill, Text, LabelValue, Line, Rect, Wrapped, Table,
+                    Keep, Rows, Page, compile_layout, replay, escape)
+
+# Define PDF page dimensions and margins
+WIDTH, HEIGHT = A4
+BORDER_MARGIN = 20
+
+# --- Compact output: compressed binary streams, letterhead and footer stored once per PDF ---
+COMPACT_PDF = env_flag("ALFA_COMPACT_PDF", default=True)
+# Size budget per PDF in KiB (0 disables the check)
+PDF_SIZE_BUDGET_KB = float(os.getenv("ALFA_PDF_SIZE_BUDGET_KB", "0"))
+# --- Deterministic output: identical inputs give byte-identical PDFs ---
+DETERMINISTIC_PDF = env_flag("ALFA_DETERMINISTIC_PDF", default=True)
+
+
+def new_canvas(buffer, compact=None, deterministic=None):
+    """Creates the A4 canvas for a document, using the compact/deterministic settings if requested.
+
+    Without either setting this is a stock canvas.Canvas(buffer, pagesize=A4).
+    """
+    if compact is None:
+        compact = COMPACT_PDF
+    if deterministic is None:
+        deterministic = DETERMINISTIC_PDF
+    options = {'pagesize': A4}
+    if deterministic:
+        # No wall-clock timestamp and no random file ID
+        options['invariant'] = 1
+    if compact:
+        # Compressed whatever the local rl_config says; redundant font changes
+        # are already dropped when the layout is compiled
+        options['pageCompression'] = 1
+    return canvas.Canvas(buffer, **options)
+
+
+# rl_config.useA85 is read while a PDF is written out; saves take this lock so
+# concurrent renders never see each other's setting
+_save_lock = threading.Lock()
+
+
+@contextmanager
+def _stream_encoding(binary):
+    """Writes streams as binary Flate data instead of ASCII85 text (25% smaller) if `binary`."""
+    with _save_lock:
+        previous = rl_config.useA85
+        if binary:
+            rl_config.useA85 = 0
+        try:
+            yield
+        finally:
+            rl_config.useA85 = previous
+
+
+def set_document_metadata(c, title, doc_no, date_str, deterministic=None):
+    """Writes the PDF info dictionary for a document.
+
+    In deterministic mode the creation date is the document date (dd/mm/YYYY)
+    and the file ID is derived from the document number and date, so two renders
+    of the same document are byte-identical while different documents still get
+    different IDs.
+    """
+    if deterministic is None:
+        deterministic = DETERMINISTIC_PDF
+    c.setTitle(f"{title} {doc_no}")
+    c.setSubject(title)
+    c.setAuthor(get_config().company["name"])
+    c.setCreator("AlfaQuote")
+    if deterministic:
+        day, month, year = (int(part) for part in date_str.split('/'))
+        # A calendar date with no UTC offset: the time zone is left unspecified
+        c.setDateFormatter(lambda *_: f"D:{year:04d}{month:02d}{day:02d}000000")
+        _seed_file_id(c, f"{doc_no}|{date_str}")
+
+
+def _seed_file_id(c, seed):
+    """Derives the PDF file /ID from `seed` instead of the timestamp and random bytes.
+
+    Canvas has no public API for this: it feeds the seed to the private
+    PDFDocument.updateSignature() (checked against ReportLab 5.0.1), whose
+    digest becomes the /ID when the document is saved.
+    """
+    c._doc.updateSignature(seed)
+
+
+def pdf_size_report(buffer, budget_kb=None):
+    """Returns (size in KiB, within budget) for a rendered PDF buffer."""
+    if budget_kb is None:
+        budget_kb = PDF_SIZE_BUDGET_KB
+    size_kb = len(buffer.getbuffer()) / 1024
+    return size_kb, (not budget_kb or size_kb <= budget_kb)
+
+
+# --- Layouts ---
+RIGHT_POS = WIDTH - 50
+# Lowest baseline for body content; the footer sits below it
+BODY_BOTTOM = BORDER_MARGIN + 40
+
+
+def _literal(company):
+    """Company strings with braces escaped, so config values are never read as placeholders."""
+    return {key: escape(value) for key, value in company.items()}
+
+
+def _letterhead(company, title, title_y):
+    """Page border, company header and document title shared by every document type."""
+    return [
+        Rect(BORDER_MARGIN, BORDER_MARGIN, WIDTH - 2 * BORDER_MARGIN, HEIGHT - 2 * BORDER_MARGIN),
+        Fill('#255290'),
+        Font("Helvetica-Bold", 12),
+        SetY(HEIGHT - 40), Text(WIDTH / 2, company["name"].upper(), 'centre'),
+        Fill((0, 0, 0)),
+        Font("Helvetica", 9),
+        SetY(HEIGHT - 55),
+        Text(WIDTH / 2, f"Registered Office : {company['registered_office']}", 'centre'),
+        SetY(HEIGHT - 68),
+        Text(WIDTH / 2, f"CIN : {company['cin']} | Mail : {company['contact_email']} | Contact : {company['phone']}", 'centre'),
+        Font("Helvetica-Bold", 14),
+        SetY(HEIGHT - title_y), Text(WIDTH / 2, title, 'centre'),
+    ]
+
+
+def _customer_block():
+    """Name, email, wrapped address and GSTIN of the customer."""
+    return [
+        LabelValue(50, "Name : ", "{customer_name}", value_font=("Helvetica-Bold", 10)),
+        Font("Helvetica", 10),
+        Move(15), Text(50, "Email : {customer_email}"),
+        Move(15), Wrapped(50, WIDTH - 100, "Address : {address}", gap=15),
+        Text(50, "GSTIN : {gstin}"),
+    ]
+
+
+def _footer(company, document_kind):
+    return [
+        Font("Helvetica-Oblique", 9),
+        SetY(BORDER_MARGIN + 15),
+        Text(50, f"This is a computer generated {document_kind} and does not require physical signature. "
+                 f"For any queries, contact {company['contact_email']}"),
+    ]
+
+
+def quotation_layout(company):
+    """Layout of the sales quotation for the given company letterhead."""
+    company = _literal(company)
+    frame = _letterhead(company, "Sales Quotation", 100) + _footer(company, "quotation")
+    body = [
+        # Supplier Info
+        LabelValue(50, "Name of Supplier: ", company["name"]),
+        Move(15),
+        LabelValue(50, "Quotation No: ", "{quote_no}"),
+        Text(RIGHT_POS, "Date: {date_str}", 'right'),
+        Move(30), Text(50, f"Head Office: {company['head_office']}"),
+        Move(15), Text(50, f"GSTIN : {company['gstin']}"),
+        Move(15), Text(50, f"E-mail: {company['sales_email']}"),
+        Move(15), Text(50, f"Phone: {company['phone']}"),
+
+        # Customer Details
+        Move(30), Font("Helvetica-Bold", 11), Text(50, "Customer Details"),
+        Move(15),
+    ] + _customer_block() + [
+        # Product Details Table, one row per line item
+        Move(30),
+        Keep([
+            Font("Helvetica-Bold", 11), Text(50, "Product Details"),
+            Move(20),
+            Rows('line_items', header=[
+                Table([(50, "S No."), (90, "Product Description"), (350, "Unit"),
+                       (420, "Rate/Unit (Rs.)"), (510, "Total (Rs.)")], 50, 550),
+            ], items=[
+                Font("Helvetica", 10),
+                Text(55, "{sno}"),
+                Text(350, "{unit_text}"),
+                Text(480, "{rate_per_unit_exclusive:,.2f}", 'right'),
+                Text(550, "{total_exclusive_gst:,.2f}", 'right'),
+                Wrapped(90, 250, "{description}", top=10, gap=15),
+            ]),
+        ]),
+
+        # Total Calculations Section
+        Keep([
+            Font("Helvetica", 10),
+            Text(300, "Sub Total:"), Text(550, "{sub_total:,.2f}", 'right'),
+            Move(20),
+            Text(300, "Add GST ({gst_percent:.2f}%):"), Text(550, "{gst_amount:,.2f}", 'right'),
+            Move(10), Line(300, 550),
+            Move(20), Font("Helvetica-Bold", 12),
+            Text(300, "Grand Total:"), Text(550, "Rs. {total_inclusive_gst:,.2f}", 'right'),
+        ]),
+
+        # Amount in Words
+        Move(30), LabelValue(50, "Value in words", ": Rupees {amount_words} Only."),
+
+        # Declaration
+        Move(40),
+        Keep([
+            Font("Helvetica-Bold", 10), Text(50, "Declaration:"),
+            Move(15), Font("Helvetica", 10),
+            Text(50, f"On behalf of M/s {company['name']} generated by Mr. {{generator_name}}"),
+            Move(15), Text(50, "- The particulars given above are true and correct."),
+        ]),
+
+        # Terms & Conditions
+        Move(30),
+        Keep([
+            Font("Helvetica-Bold", 10), Text(50, "Terms & Conditions -"),
+            Move(15), Font("Helvetica", 10),
+            Wrapped(50, WIDTH - 100, "1 - Payment terms: {payment_terms}", gap=5),
+        ]),
+        Wrapped(50, WIDTH - 100, "2 - Delivery terms: Dispatch within 30 working days from order placement.", gap=5),
+
+        # Signature (Right-Aligned), at the foot of the last page
+        SetY(BORDER_MARGIN + 80),
+        Font("Helvetica", 10),
+        Text(RIGHT_POS, "{generator_name}", 'right'),
+        Text(RIGHT_POS, "{generator_title}", 'right', -12),
+        Text(RIGHT_POS, f"{company['short_name']}, {company['signature_address']}", 'right', -24),
+    ]
+    return Page(frame, body, top=HEIGHT - 130, bottom=BODY_BOTTOM)
+
+
+def receipt_layout(company):
+    """Layout of the payment receipt for the given company letterhead."""
+    company = _literal(company)
+    frame = _letterhead(company, "OFFICIAL PAYMENT RECEIPT", 110) + _footer(company, "receipt")
+    body = [
+        # Receipt Number and Date
+        Font("Helvetica-Bold", 11), Text(50, "Receipt No:"),
+        Font("Helvetica", 11), Text(130, "{receipt_no}"),
+        Font("Helvetica-Bold", 11), Text(WIDTH - 150, "Date:", 'right'),
+        Font("Helvetica", 11), Text(RIGHT_POS, "{receipt_date_str}", 'right'),
+
+        # Payer Info (Customer Details)
+        Move(40), Font("Helvetica-Bold", 11), Text(50, "RECEIVED FROM"), Line(50, WIDTH - 50, -2),
+        Move(15),
+    ] + _customer_block() + [
+        # Payment Details Table
+        Move(30),
+        Keep([
+            Font("Helvetica-Bold", 11), Text(50, "PAYMENT INFORMATION"),
+            Move(20),
+            Rows('payments', header=[
+                Table([(50, "S No."), (90, "Description / Purpose"), (420, "Mode of Payment"),
+                       (510, "Amount (Rs.)")], 50, 550),
+            ], items=[
+                Font("Helvetica", 10),
+                Text(55, "{sno}"),
+                Text(420, "{mode_of_payment}"),
+                Text(550, "{amount_received:,.2f}", 'right'),
+                Wrapped(90, 320, "{description}", top=10, gap=15),
+            ]),
+        ]),
+
+        # Reference Details
+        Font("Helvetica-Bold", 10), Text(50, "Reference/Txn Details:"),
+        Font("Helvetica", 10), Text(180, "{reference_details}"),
+
+        # Total Amount Received Section
+        Move(40), Font("Helvetica-Bold", 12),
+        Text(300, "TOTAL AMOUNT RECEIVED:"), Text(550, "Rs. {amount_received:,.2f}", 'right'),
+
+        # Amount in Words
+        Move(30), LabelValue(50, "Value in words", ": Rupees {amount_words} Only."),
+
+        # Note / Declaration
+        Move(40),
+        Keep([
+            Font("Helvetica-Bold", 10), Text(50, "Note:"),
+            Move(15), Font("Helvetica", 10),
+            Text(50, "This receipt acknowledges payment towards the specified purpose and details above."),
+            Move(15), Text(50, "Currency is Indian Rupees (INR) unless otherwise specified."),
+            Move(15), LabelValue(50, "Payment received by:", "{generator_name}", gap=5),
+        ]),
+
+        # Signature (Right-Aligned) - Issued By
+        Move(30),
+        Keep([
+            Font("Helvetica", 10), Text(RIGHT_POS, f"For {company['short_name']}", 'right'),
+            Move(15), Font("Helvetica-Bold", 10), Text(RIGHT_POS, "{generator_name}", 'right'),
+            Font("Helvetica", 9), Text(RIGHT_POS, "{generator_title}", 'right', -12),
+        ]),
+    ]
+    return Page(frame, body, top=HEIGHT - 140, bottom=BODY_BOTTOM)
+
+
+LAYOUTS = {'quotation': quotation_layout, 'receipt': receipt_layout}
+_plans = {}
+
+
+def get_plan(kind):
+    """Returns the compiled plan for 'quotation' or 'receipt'.
+
+    Plans are compiled once and replayed for every document; they are only
+    recompiled when get_config() hands out a new config (config.toml changed).
+    """
+    config = get_config()
+    cached = _plans.get(kind)
+    if cached is None or cached[0] is not config:
+        cached = (config, compile_layout(LAYOUTS[kind](config.company)))
+        _plans[kind] = cached
+    return cached[1]
+
+
+# One row of the quotation's product table
+LineItem = namedtuple('LineItem', 'description unit_text rate_per_unit_exclusive total_exclusive_gst')
+
+
+def _paragraph_text(text):
+    return text.replace('\n', '<br/>')
+
+
+@lru_cache(maxsize=512)
+def amount_in_words(amount):
+    """Rupee amount spelled out in Indian English, e.g. 'Three Lakh'."""
+    return num2words(round(amount), lang='en_IN').title()
+
+
+def _render(plan, title, doc_no, date_str, fields, compact, deterministic, wrap_cache):
+    if compact is None:
+        compact = COMPACT_PDF
+    buffer = io.BytesIO()
+    c = new_canvas(buffer, compact, deterministic)
+    set_document_metadata(c, title, doc_no, date_str, deterministic)
+    # Compact PDFs keep a single copy of the letterhead and footer, shared by all pages
+    replay(c, plan, fields, wrap_cache, frame_form='frame' if compact else None)
+
+    # ---- Save PDF to buffer ----
+    c.showPage()
+    with _stream_encoding(binary=compact):
+        c.save()
+    buffer.seek(0)
+    return buffer
+
+
+def _check_totals(sub_total, gst_percent, gst_amount, total_inclusive_gst, row_count):
+    """Raises ValueError unless the GST and grand total add up with the line items."""
+    # Callers price every row on its own, so allow a paisa of rounding per row
+    tolerance = 0.01 * row_count
+    expected_gst = sub_total * gst_percent / 100
+    if abs(gst_amount - expected_gst) > tolerance:
+        raise ValueError(f"GST amount {gst_amount:,.2f} is not {gst_percent:.2f}% of the "
+                         f"sub total {sub_total:,.2f} (expected {expected_gst:,.2f})")
+    if abs(total_inclusive_gst - (sub_total + gst_amount)) > tolerance:
+        raise ValueError(f"Grand total {total_inclusive_gst:,.2f} is not the sub total {sub_total:,.2f} "
+                         f"plus GST {gst_amount:,.2f}")
+
+
+def render_quotation(quote_no, date_str, customer_name, customer_email, address, gstin,
+                     product_description, unit_text, rate_per_unit_exclusive, total_exclusive_gst,
+                     gst_percent, gst_amount, total_inclusive_gst, payment_terms,
+                     generator_name, generator_title, compact=None, deterministic=None, wrap_cache=None,
+                     line_items=()):
+    """Draws the sales quotation and returns it as a rewound BytesIO buffer.
+
+    product_description, unit_text, rate_per_unit_exclusive and total_exclusive_gst
+    describe the main product row; line_items are further LineItem rows listed
+    after it. gst_amount and total_inclusive_gst cover the whole quotation and
+    must agree with the rows (ValueError otherwise).
+    """
+    rows = [LineItem(product_description, unit_text, rate_per_unit_exclusive, total_exclusive_gst)]
+    rows.extend(LineItem(*item) for item in line_items)
+    sub_total = sum(item.total_exclusive_gst for item in rows)
+    _check_totals(sub_total, gst_percent, gst_amount, total_inclusive_gst, len(rows))
+    fields = dict(
+        quote_no=quote_no, date_str=date_str, customer_name=customer_name,
+        customer_email=customer_email, address=_paragraph_text(address), gstin=gstin,
+        line_items=[item._replace(description=_paragraph_text(item.description)) for item in rows],
+        sub_total=sub_total,
+        gst_percent=gst_percent, gst_amount=gst_amount, total_inclusive_gst=total_inclusive_gst,
+        amount_words=amount_in_words(total_inclusive_gst),
+        payment_terms=payment_terms, generator_name=generator_name, generator_title=generator_title,
+    )
+    return _render(get_plan('quotation'), "Sales Quotation", quote_no, date_str, fields, compact, deterministic, wrap_cache)
+
+
+def render_receipt(receipt_no, receipt_date_str, customer_name, customer_email, address, gstin,
+                   product_description, mode_of_payment, reference_details, amount_received,
+                   generator_name, generator_title, compact=None, deterministic=None, wrap_cache=None):
+    """Draws the payment receipt and returns it as a rewound BytesIO buffer."""
+    fields = dict(
+        receipt_no=receipt_no, receipt_date_str=receipt_date_str, customer_name=customer_name,
+        customer_email=customer_email, address=_paragraph_text(address), gstin=gstin,
+        payments=[dict(description=_paragraph_text(product_description))], mode_of_payment=mode_of_payment,
+        reference_details=reference_details, amount_received=amount_received,
+        amount_words=amount_in_words(amount_received),
+        generator_name=generator_name, generator_title=generator_title,
+    )
+    return _render(get_plan('receipt'), "Payment Receipt", receipt_no, receipt_date_str, fields, compact, deterministic, wrap_cache)
@@ -0,0 +1,21 @@
+"""Exclusive locks shared by the app processes, held on a `<path>.lock` file."""
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process use only
+    fcntl = None
+
+
+@contextmanager
+def file_lock(path):
+    """Holds an exclusive lock on `path` across processes (flock on path + ".lock")."""
+    if fcntl is None:
+        yield
+        return
+    with open(f"{path}.lock", "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
@@ -0,0 +1,413 @@
+"""Declarative page layouts compiled into flat lists of draw operations.
+
+A layout is a Page: a frame (border, letterhead, footer) drawn on every page,
+and a body of spec items (Text, LabelValue, Wrapped, Table, ...) that flows
+top to bottom around a vertical cursor. compile_layout() turns it into a Plan
+of flat draw operations once per process: static text is resolved, label
+widths are measured, static paragraphs are wrapped up front and redundant
+font changes are dropped. replay() then draws the plan on a canvas with one
+document's dynamic fields filled in, starting a new page (with the frame
+redrawn) whenever the body would run into the bottom margin.
+
+Text may contain str.format placeholders ("{customer_name}",
+"{amount:,.2f}") which are looked up in the fields passed to replay().
+Literal braces are written '{{' and '}}'; see escape().
+
+Wrapped paragraphs and string widths are memoized process-wide, so repeated
+text (default descriptions, terms, totals) is only measured once across
+renders, pages and threads.
+"""
+import os
+import threading
+from collections import namedtuple, OrderedDict, ChainMap
+from copy import copy
+from functools import lru_cache
+from string import Formatter
+
+from reportlab.lib.colors import HexColor
+from reportlab.lib.enums import TA_LEFT
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.platypus import Paragraph
+
+# Wrapped paragraphs kept in the process-wide cache
+WRAP_CACHE_SIZE = int(os.getenv("ALFA_WRAP_CACHE_SIZE", "512"))
+
+# --- Spec items ---
+# Moves the cursor to an absolute y; in a body, a SetY above the cursor starts a new page
+SetY = namedtuple('SetY', 'y')
+# Moves the cursor down by dy
+Move = namedtuple('Move', 'dy')
+Font = namedtuple('Font', 'name size')
+# Hex string ('#255290') or an (r, g, b) tuple
+Fill = namedtuple('Fill', 'color')
+# align is 'left', 'right' or 'centre'; dy offsets the text from the cursor
+Text = namedtuple('Text', 'x text align dy', defaults=('left', 0))
+# Bold label followed by a value drawn straight after it
+LabelValue = namedtuple('LabelValue', 'x label value label_font value_font gap',
+                        defaults=(('Helvetica-Bold', 10), ('Helvetica', 10), 0))
+Line = namedtuple('Line', 'x1 x2 dy', defaults=(0,))
+Rect = namedtuple('Rect', 'x y width height')
+# Paragraph whose top edge sits `top` above the cursor; the cursor ends `gap` below it.
+# A paragraph that does not fit above the bottom margin is split across pages.
+Wrapped = namedtuple('Wrapped', 'x width text top gap', defaults=(0, 15))
+# Header row of (x, title) columns followed by a rule from rule_x1 to rule_x2
+Table = namedtuple('Table', 'columns rule_x1 rule_x2 font', defaults=(('Helvetica-Bold', 10),))
+# Items drawn on one page; moved to the next page as a whole if they do not fit.
+# A Rows inside only brings its header and first row along (keeps a heading with its table).
+Keep = namedtuple('Keep', 'items')
+# `items` repeated (and kept together) for each mapping in fields[key], with that
+# mapping's keys and `sno` (1, 2, ...) added to the fields. `header` is drawn
+# before the first row and again at the top of every page the rows continue on.
+Rows = namedtuple('Rows', 'key items header', defaults=((),))
+# A whole document: `frame` is drawn on every page, `body` flows from `top`
+# down to `bottom` and continues at `top` on the next page
+Page = namedtuple('Page', 'frame body top bottom')
+
+# Compiled form of a Page
+Plan = namedtuple('Plan', 'frame body top bottom')
+
+# Body style shared by every wrapped paragraph
+PARA_STYLE = ParagraphStyle(
+    'Normal_Left',
+    parent=getSampleStyleSheet()['Normal'],
+    fontName='Helvetica',
+    fontSize=10,
+    leading=14,
+    alignment=TA_LEFT
+)
+
+# Paragraph.wrap only needs a bound on the height; the layout decides placement
+_WRAP_HEIGHT = 10000
+
+
+@lru_cache(maxsize=4096)
+def text_width(text, font_name, font_size):
+    """Memoized stringWidth; amounts, names and labels repeat across documents."""
+    return stringWidth(text, font_name, font_size)
+
+
+class WrapCache:
+    """Thread-safe LRU of wrapped paragraphs keyed on (text, width)."""
+
+    def __init__(self, maxsize=WRAP_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def __setitem__(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# Used by replay() when the caller does not bring its own cache
+shared_wrap_cache = WrapCache()
+
+
+def escape(text):
+    """Escapes braces so `text` is drawn literally inside a layout template."""
+    return text.replace("{", "{{").replace("}", "}}")
+
+
+def _is_template(text):
+    return any(field is not None for _, field, _, _ in Formatter().parse(text))
+
+
+def _expand(item):
+    """Rewrites composite spec items in terms of the primitive ones."""
+    if isinstance(item, LabelValue):
+        value_x = item.x + text_width(item.label, *item.label_font) + item.gap
+        return [Font(*item.label_font), Text(item.x, item.label),
+                Font(*item.value_font), Text(value_x, item.value)]
+    if isinstance(item, Table):
+        header = [Font(*item.font)] + [Text(x, title) for x, title in item.columns]
+        return header + [Move(10), Line(item.rule_x1, item.rule_x2), Move(15)]
+    return [item]
+
+
+def _compile(spec):
+    """Compiles a list of spec items into a flat tuple of draw operations."""
+    ops = []
+    current_font = None
+    for item in (prim for entry in spec for prim in _expand(entry)):
+        if isinstance(item, Font):
+            if item == current_font:
+                continue
+            current_font = item
+            ops.append(('font', item.name, item.size))
+        elif isinstance(item, Fill):
+            color = HexColor(item.color) if isinstance(item.color, str) else item.color
+            ops.append(('fill', color))
+        elif isinstance(item, Text):
+            is_template = _is_template(item.text)
+            # Static text is resolved now, which also turns '{{' / '}}' escapes into braces
+            text = item.text if is_template else item.text.format()
+            ops.append(('text', item.align, item.x, item.dy, text, is_template))
+        elif isinstance(item, Move):
+            ops.append(('move', -item.dy))
+        elif isinstance(item, SetY):
+            ops.append(('sety', item.y))
+        elif isinstance(item, Line):
+            ops.append(('line', item.x1, item.x2, item.dy))
+        elif isinstance(item, Rect):
+            ops.append(('rect', item.x, item.y, item.width, item.height))
+        elif isinstance(item, Wrapped):
+            if _is_template(item.text):
+                ops.append(('para', item.x, item.width, item.text, item.top, item.gap))
+            else:
+                para = Paragraph(item.text.format(), PARA_STYLE)
+                _, height = para.wrap(item.width, _WRAP_HEIGHT)
+                ops.append(('para_static', item.x, item.width, para, height, item.top, item.gap))
+        elif isinstance(item, Keep):
+            ops.append(('keep', _compile(item.items)))
+            # The group may be drawn on a fresh page, so the font after it is not known here
+            current_font = None
+        elif isinstance(item, Rows):
+            ops.append(('rows', item.key, _compile(item.header), _compile(item.items)))
+            current_font = None
+        else:
+            raise TypeError(f"Unknown layout item: {item!r}")
+    return tuple(ops)
+
+
+def compile_layout(page):
+    """Compiles a Page into a Plan of flat draw operations."""
+    return Plan(_compile(page.frame), _compile(page.body), page.top, page.bottom)
+
+
+def _wrapped_paragraph(text, width, cache):
+    """Returns (paragraph, height), reusing an earlier wrap of the same text if cached."""
+    key = (text, width)
+    cached = cache.get(key)
+    if cached is not None:
+        para, height = cached
+        # Shallow copy: drawOn sets para.canv, the wrapped lines are shared
+        return copy(para), height
+    para = Paragraph(text, PARA_STYLE)
+    _, height = para.wrap(width, _WRAP_HEIGHT)
+    cache[key] = (para, height)
+    return copy(para), height
+
+
+def _row_fields(row, index, fields):
+    row = row._asdict() if hasattr(row, '_asdict') else row
+    return ChainMap({'sno': index}, row, fields)
+
+
+class _Pager:
+    """Replays a plan, breaking the body across pages at the bottom margin."""
+
+    def __init__(self, c, plan, fields, cache, frame_form=None):
+        self.c = c
+        self.plan = plan
+        self.fields = fields
+        self.cache = cache
+        self.frame_form = frame_form    # form XObject name the frame is drawn into, if any
+        self.form_defined = False
+        self.y = plan.top
+        self.fresh = True   # nothing drawn in the body of this page yet
+        self.font = None    # body font and fill, restored after a page break
+        self.fill = None
+        self.repeat = []    # (ops, fields) redrawn below the frame, e.g. table headers
+
+    def draw(self):
+        self._frame()
+        self.run(self.plan.body, self.fields)
+        return self.y
+
+    def _frame(self):
+        y, font, fill = self.y, self.font, self.fill
+        if self.frame_form is None or self.c.getPageNumber() == 1:
+            self.run(self.plan.frame, self.fields, flow=False)
+        else:
+            # Continuation pages reference one copy of the frame, so a single-page
+            # document does not pay for the form object
+            if not self.form_defined:
+                self.c.beginForm(self.frame_form)
+                self.run(self.plan.frame, self.fields, flow=False)
+                self.c.endForm()
+                self.form_defined = True
+            self.c.doForm(self.frame_form)
+        self.y, self.font, self.fill = y, font, fill
+
+    def new_page(self):
+        c = self.c
+        font, fill = self.font, self.fill
+        c.showPage()
+        self._frame()
+        self.y = self.plan.top
+        for ops, fields in self.repeat:
+            self.run(ops, fields, flow=False)
+        if font is not None:
+            c.setFont(*font)
+        if fill is not None:
+            c.setFillColor(fill)
+        self.font, self.fill = font, fill
+        self.fresh = True
+
+    def _fits(self, y):
+        return self.fresh or y >= self.plan.bottom
+
+    def run(self, ops, fields, flow=True):
+        c = self.c
+        for op in ops:
+            code = op[0]
+            if code == 'text':
+                _, align, x, dy, text, is_template = op
+                if flow and not self._fits(self.y + dy):
+                    self.new_page()
+                if is_template:
+                    text = text.format_map(fields)
+                if align != 'left':
+                    width = text_width(text, c._fontname, c._fontsize)
+                    x -= width if align == 'right' else width / 2
+                c.drawString(x, self.y + dy, text)
+                self.fresh = self.fresh and not flow
+            elif code == 'move':
+                self.y += op[1]
+            elif code == 'font':
+                c.setFont(op[1], op[2])
+                self.font = op[1:]
+            elif code == 'sety':
+                if flow and op[1] > self.y and not self.fresh:
+                    self.new_page()
+                self.y = op[1]
+            elif code == 'para':
+                _, x, width, text, top, gap = op
+                para, height = _wrapped_paragraph(text.format_map(fields), width, self.cache)
+                self._paragraph(para, x, width, height, top, flow)
+                self.y -= gap
+            elif code == 'para_static':
+                _, x, width, para, height, top, gap = op
+                self._paragraph(copy(para), x, width, height, top, flow)
+                self.y -= gap
+            elif code == 'line':
+                _, x1, x2, dy = op
+                c.line(x1, self.y + dy, x2, self.y + dy)
+            elif code == 'fill':
+                c.setFillColor(op[1])
+                self.fill = op[1]
+            elif code == 'rect':
+                c.rect(*op[1:])
+            elif code == 'keep':
+                self._keep(op[1], fields, flow)
+            elif code == 'rows':
+                self._rows(op[1], op[2], op[3], fields, flow)
+
+    def _paragraph(self, para, x, width, height, top, flow):
+        while flow and self.y + top - height < self.plan.bottom:
+            available = self.y + top - self.plan.bottom
+            # split() may drop the wrapped lines of the paragraph it is called on
+            parts = copy(para).split(width, available) if available > 0 else []
+            if len(parts) < 2:
+                if self.fresh:
+                    break  # cannot be split any further; let it run into the margin
+                self.new_page()
+                continue
+            first, para = parts
+            _, first_height = first.wrap(width, _WRAP_HEIGHT)
+            first.drawOn(self.c, x, self.y + top - first_height)
+            self.new_page()
+            _, height = para.wrap(width, _WRAP_HEIGHT)
+        para.drawOn(self.c, x, self.y + top - height)
+        self.y += top - height
+        self.fresh = self.fresh and not flow
+
+    def _extent(self, ops, fields):
+        """Returns (lowest point, end of cursor) of ops relative to the cursor, without drawing."""
+        y = low = 0
+        for op in ops:
+            code = op[0]
+            if code in ('text', 'line'):
+                low = min(low, y + op[3])
+            elif code == 'move':
+                y += op[1]
+            elif code == 'para':
+                _, x, width, text, top, gap = op
+                _, height = _wrapped_paragraph(text.format_map(fields), width, self.cache)
+                y += top - height
+                low = min(low, y)
+                y -= gap
+            elif code == 'para_static':
+                _, x, width, para, height, top, gap = op
+                y += top - height
+                low = min(low, y)
+                y -= gap
+            elif code == 'keep':
+                inner_low, inner_end = self._extent(op[1], fields)
+                low, y = min(low, y + inner_low), y + inner_end
+            elif code == 'rows':
+                # Only the header and first row need to fit for the table to start here
+                _, key, header, row_ops = op
+                rows = fields[key]
+                if rows:
+                    header_low, header_end = self._extent(header, fields)
+                    row_low, _ = self._extent(row_ops, _row_fields(rows[0], 1, fields))
+                    low = min(low, y + header_low, y + header_end + row_low)
+                break
+        return low, y
+
+    def _make_room(self, ops, fields, flow, lead=()):
+        """Starts a new page unless `lead` followed by `ops` fits on this one.
+
+        A group taller than a whole page is flowed from where it is instead.
+        """
+        if flow and not self.fresh:
+            lead_low, lead_end = self._extent(lead, fields)
+            low, _ = self._extent(ops, fields)
+            height = -min(lead_low, lead_end + low)
+            if self.y - height < self.plan.bottom and height <= self.plan.top - self.plan.bottom:
+                self.new_page()
+
+    def _keep(self, ops, fields, flow):
+        """Draws `ops` on one page, moving to a new page if they do not fit on this one."""
+        self._make_room(ops, fields, flow)
+        self.run(ops, fields, flow)
+
+    def _rows(self, key, header, row_ops, fields, flow):
+        rows = fields[key]
+        for index, row in enumerate(rows, start=1):
+            row_fields = _row_fields(row, index, fields)
+            if index == 1:
+                # The header goes with the first row, and is repeated on every later
+                # page, including one the first row itself continues on
+                self._make_room(row_ops, row_fields, flow, lead=header)
+                self.run(header, fields, flow)
+                self.repeat.append((header, fields))
+                self.run(row_ops, row_fields, flow)
+            else:
+                self._keep(row_ops, row_fields, flow)
+        if rows:
+            self.repeat.pop()
+
+
+def replay(c, plan, fields, wrap_cache=None, frame_form=None):
+    """Draws a compiled plan on the canvas, filling templates from `fields`.
+
+    Pages are broken as needed; the caller ends the last page with showPage().
+    wrap_cache is an optional dict-like cache of wrapped dynamic paragraphs;
+    the process-wide LRU is used when it is not given. With frame_form (a
+    form name), the frame is stored once in the PDF as a form XObject that
+    every continuation page references, instead of being drawn again on each.
+    Returns the final y.
+    """
+    if wrap_cache is None:
+        wrap_cache = shared_wrap_cache
+    return _Pager(c, plan, fields, wrap_cache, frame_form).draw()
@@ -0,0 +1,68 @@
+"""Live PDF preview pane for the Streamlit apps.
+
+The preview renders a draft of the document as the form changes, without
+allocating a document number or sending any email. Rendering is debounced:
+the pane waits until the inputs have been stable for PREVIEW_DEBOUNCE_S before
+re-rendering, and skips the render entirely when nothing changed. Only while
+an edit is waiting to settle does a small timer fragment poll (and it carries
+just a caption, not the PDF); an idle preview costs nothing.
+
+Each render redraws the whole page from the compiled layout plan. Wrapped
+paragraphs (address, description, terms) are kept in a per-session cache, so
+only text that changed is wrapped again. The PDF is shown with st.pdf, which
+keeps it in Streamlit's media store and sends the browser a URL: a rerun from
+an unrelated widget re-sends that URL, not the document.
+"""
+import os
+import time
+
+import streamlit as st
+
+PREVIEW_DEBOUNCE_S = float(os.getenv("ALFA_PREVIEW_DEBOUNCE_S", "0.75"))
+# Wrapped paragraphs kept per session before the cache is cleared
+PREVIEW_WRAP_CACHE_SIZE = 64
+
+
+def _preview_state(key):
+    state_key = f"preview_{key}"
+    if state_key not in st.session_state:
+        st.session_state[state_key] = {
+            "fields": None,          # latest form inputs
+            "changed_at": 0.0,       # when they last changed
+            "rendered_fields": None, # inputs the current PDF was rendered from
+            "pdf": None,
+            "wrap_cache": {},
+        }
+    return st.session_state[state_key]
+
+
+@st.fragment(run_every=PREVIEW_DEBOUNCE_S)
+def _debounce_timer(key):
+    """Ticks while an edit is pending and reruns the app once it has settled."""
+    state = _preview_state(key)
+    if time.monotonic() - state["changed_at"] >= PREVIEW_DEBOUNCE_S:
+        st.rerun()
+    st.caption("⏳ Updating preview…")
+
+
+def show_preview(key, render, fields):
+    """Shows a debounced live preview of `render(**fields)` (a documents.render_* function)."""
+    state = _preview_state(key)
+    if fields != state["fields"]:
+        state["fields"] = fields
+        state["changed_at"] = time.monotonic()
+
+    pending = state["fields"] != state["rendered_fields"]
+    settled = time.monotonic() - state["changed_at"] >= PREVIEW_DEBOUNCE_S
+    if pending and (settled or state["pdf"] is None):
+        if len(state["wrap_cache"]) > PREVIEW_WRAP_CACHE_SIZE:
+            state["wrap_cache"].clear()
+        state["pdf"] = render(**fields, wrap_cache=state["wrap_cache"]).getvalue()
+        state["rendered_fields"] = fields
+        pending = False
+
+    if state["pdf"]:
+        st.pdf(state["pdf"], height=800)
+    if pending:
+        # The timer is only on the page while an edit is pending, so an idle preview never polls
+        _debounce_timer(key)
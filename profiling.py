@@ -0,0 +1,80 @@
+"""Opt-in profiling for a single quotation or receipt generation.
+
+Set ALFA_PROFILE=1 (or open the app with ?profile=1) and the next generation is
+run under cProfile and tracemalloc. The results are written to PROFILE_DIR as a
+`.prof` file (open with snakeviz or pstats) and a plain-text report listing the
+top allocation sites and the most expensive calls.
+"""
+import os
+import re
+from contextlib import contextmanager
+from datetime import datetime
+
+from config import env_flag
+
+PROFILE_ENV_VAR = "ALFA_PROFILE"
+PROFILE_DIR = os.getenv("ALFA_PROFILE_DIR", "profiles")
+PROFILE_TOP_N = int(os.getenv("ALFA_PROFILE_TOP_N", "25"))
+
+
+def profiling_enabled():
+    """Returns True when profiling has been switched on through the environment."""
+    return env_flag(PROFILE_ENV_VAR)
+
+
+def _safe_label(label):
+    # Document numbers contain slashes (ALF/25-26/10/0042), which are not valid in file names
+    return re.sub(r"[^A-Za-z0-9_.-]+", "_", label).strip("_")
+
+
+@contextmanager
+def profile_generation(label, enabled=None, top_n=PROFILE_TOP_N):
+    """Profiles the wrapped block and saves a `.prof` file plus an allocation report.
+
+    Yields a dict that is filled with the 'prof' and 'report' paths once the
+    block finishes, and stays empty when profiling is disabled.
+    """
+    if enabled is None:
+        enabled = profiling_enabled()
+    report = {}
+    if not enabled:
+        yield report
+        return
+    # Only paid for when profiling is actually on
+    import cProfile
+    import pstats
+    import tracemalloc
+
+    started_tracing = not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start(10)
+    before = tracemalloc.take_snapshot()
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield report
+    finally:
+        profiler.disable()
+        after = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+        if started_tracing:
+            tracemalloc.stop()
+
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        stem = f"{_safe_label(label)}_{datetime.now():%Y%m%d_%H%M%S}"
+        prof_path = os.path.join(PROFILE_DIR, f"{stem}.prof")
+        report_path = os.path.join(PROFILE_DIR, f"{stem}_report.txt")
+        profiler.dump_stats(prof_path)
+
+        with open(report_path, "w") as f:
+            f.write(f"Profile report for {label}\n")
+            f.write(f"Peak traced memory: {peak / 1024:,.1f} KiB\n\n")
+            f.write(f"Top {top_n} allocation sites (new since start of generation):\n")
+            for stat in after.compare_to(before, "lineno")[:top_n]:
+                f.write(f"  {stat}\n")
+            f.write(f"\nTop {top_n} calls by cumulative time:\n")
+            stats = pstats.Stats(profiler, stream=f)
+            stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(top_n)
+
+        report["prof"] = prof_path
+        report["report"] = report_path
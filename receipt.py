@@ -1,69 +1,25 @@
 import streamlit as st
 import sys
+import hashlib
+from io import BytesIO
 import os
-import io
 from datetime import datetime
 from uuid import uuid4 # Used for stable session state key
 from dotenv import load_dotenv
 load_dotenv()
 
-# --- NEW IMPORTS for Email Automation ---
-import smtplib
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
-from email.mime.application import MIMEApplication
 from email.utils import COMMASPACE 
-# ----------------------------------------
-
-# --- ReportLab Imports for advanced styling ---
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfgen import canvas
-from reportlab.lib.colors import HexColor
-from reportlab.platypus import Paragraph
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.enums import TA_LEFT
-
-from num2words import num2words
-
-# File path where the last serial number is stored
-COUNTER_FILE = "last_receipt_num.txt"
-INITIAL_COUNTER_VALUE = 99 # The number *before* the first desired receipt (0100)
-
-# Function to read the last counter value from file
-def read_last_counter():
-    try:
-        with open(COUNTER_FILE, 'r') as f:
-            return int(f.read().strip())
-    except FileNotFoundError:
-        # If file doesn't exist, use the initial value
-        return INITIAL_COUNTER_VALUE
-    except ValueError:
-        # If file content is invalid, reset to initial value
-        return INITIAL_COUNTER_VALUE
-
-# Function to write the new counter value to file
-def write_new_counter(new_value):
-    try:
-        with open(COUNTER_FILE, 'w') as f:
-            f.write(str(new_value))
-    except Exception as e:
-        st.error(f"Error writing counter to file: {e}")
-
-# Initialize the persistent counter in session state only once per application run
-if 'receipt_counter_persistent' not in st.session_state:
-    st.session_state['receipt_counter_persistent'] = read_last_counter()
-
-# Function to get the next sequential receipt number
-def get_next_receipt_number_persistent(date: datetime):
-    # Only increment and update the global counter when the button is pressed (outside of this function)
-    counter = st.session_state['receipt_counter_persistent'] + 1
-    date_str = date.strftime("%d%m%y")
-    return f"REC/{date_str}/{counter:04d}"
 
+# --- Heavy modules (ReportLab, num2words, smtplib, email.mime) are imported on first
+# render/send, and pre-warmed in the background once the UI is up (see warmup.py) ---
+from profiling import profiling_enabled, profile_generation
+from preview import show_preview
+from warmup import start_prewarm
+from config import get_config, ConfigError
+from receipt_numbers import allocate_receipt_numbers, format_receipt_number
 
 # Compatibility patch for hashlib on older Python versions
 if sys.version_info < (3, 9):
-    import hashlib
     original_md5 = hashlib.md5
     def patched_md5(*args, **kwargs):
         kwargs.pop('usedforsecurity', None)
@@ -71,60 +27,42 @@ if sys.version_info < (3, 9):
     hashlib.md5 = patched_md5
 
 
-# --- SESSION STATE INITIALIZATION for Sequential Counter ---
-if 'receipt_counter' not in st.session_state:
-    # Starting counter at 100 as requested. This will be the first receipt number suffix.
-    st.session_state['receipt_counter'] = 99 
-    
-# Function to get the next sequential receipt number
+# Function to get the next sequential receipt number (persisted in COUNTER_FILE,
+# shared with bulk imports so numbers never repeat across sessions or restarts)
 def get_next_receipt_number(date: datetime):
-    # Only increment the counter once per generation session
-    if 'current_receipt_num' not in st.session_state:
-        st.session_state['receipt_counter'] += 1
-        st.session_state['current_receipt_num'] = st.session_state['receipt_counter']
-    
-    counter = st.session_state['current_receipt_num']
-    date_str = date.strftime("%d%m%y")
-    return f"REC/{date_str}/{counter:04d}"
+    counter = allocate_receipt_numbers(1)[0]
+    return format_receipt_number(date, counter)
 
 # --- EMAIL CONFIGURATION (MUST BE UPDATED) ---
 SENDER_EMAIL = os.getenv("SENDER_EMAIL")
 SENDER_PASSWORD = os.getenv("SENDER_PASSWORD")
 INTERNAL_RECEIVER_EMAIL = os.getenv("INTERNAL_RECEIVER_EMAIL")
 
-# --- PRIMARY CC MAPPING (Used for internal tracking) ---
-PRIMARY_CC_MAPPING = {
-    "Kiran Shukla": "kiran.alfaleus@gmail.com",
-    "Sandal Kotawala": "info@alfaleus.com",
-    "Abdul Baquee": "abdul.alfaleus@gmail.com",
-    "Pius Varghese": "pius.alfaleus@gmail.com"
-}
-# --- SECONDARY CC LIST (Always included on customer emails) ---
-SECONDARY_CC_EMAILS = ["sandal@alfaleus.com"]
-# ---------------------------------------------
-SMTP_SERVER = "smtp.gmail.com"
-SMTP_PORT = 587
-# ---------------------------------------------
-
-# --- GENERATOR CONFIGURATION (Now the "Receiver" / Issuer) ---
-GENERATOR_DETAILS = {
-    "Kiran Shukla": "Head of Sales",
-    "Abdul Baquee": "Sales Coordinator",
-    "Pius Varghese": "Operations Manager",
-    "Sandal Kotawala": "CEO"
-}
+# --- SHARED CONFIGURATION (config.toml, reloaded when the file changes) ---
+try:
+    CONFIG = get_config()
+except ConfigError as e:
+    st.error(f"❌ Configuration error: {e}")
+    st.stop()
+PRIMARY_CC_MAPPING = CONFIG.primary_cc_mapping
+SECONDARY_CC_EMAILS = CONFIG.secondary_cc_emails
+SMTP_SERVER = CONFIG.smtp_server
+SMTP_PORT = CONFIG.smtp_port
+GENERATOR_DETAILS = CONFIG.generator_details
+COMPANY_NAME = CONFIG.company["name"]
+COMPANY_SHORT_NAME = CONFIG.company["short_name"]
 # -----------------------------------
 
 st.title("💰 Alfaleus Payment Receipt Generator")
 
-# Define PDF page dimensions and margins
-WIDTH, HEIGHT = A4
-BORDER_MARGIN = 20
-
 # --- MODIFIED Function to send the receipt PDF via email ---
 def send_receipt_email(receipt_no, recipient_email, customer_name, pdf_buffer, generator_name, cc_emails=[], is_customer_send=False):
     """Sends the PDF receipt as an attachment to the specified email."""
-    
+    import smtplib
+    from email.mime.multipart import MIMEMultipart
+    from email.mime.text import MIMEText
+    from email.mime.application import MIMEApplication
+
     msg = MIMEMultipart()
     msg['From'] = SENDER_EMAIL
     msg['To'] = recipient_email
@@ -132,7 +70,7 @@ def send_receipt_email(receipt_no, recipient_email, customer_name, pdf_buffer, g
     recipients = [recipient_email]
 
     if is_customer_send:
-        msg['Subject'] = f"Payment Receipt {receipt_no} from Alfaleus Tech Pvt Ltd"
+        msg['Subject'] = f"Payment Receipt {receipt_no} from {COMPANY_SHORT_NAME}"
         
         # --- ADD CC for Customer Send ---
         msg['Cc'] = COMMASPACE.join(cc_emails)
@@ -145,7 +83,7 @@ def send_receipt_email(receipt_no, recipient_email, customer_name, pdf_buffer, g
             f"Thank you for your payment. Please find attached the official Payment Receipt (No. {receipt_no}).\n\n"
             f"Best regards,\n"
             f"{generator_name}\n"
-            f"{generator_title}, Alfaleus Technology Private Limited"
+            f"{generator_title}, {COMPANY_NAME}"
         )
         success_msg = f"📧 Receipt successfully sent to **{recipient_email}** (Customer) and CC'd to internal team: **{COMMASPACE.join(cc_emails)}**"
         error_prefix = "❌ Failed to send email to customer"
@@ -178,6 +116,49 @@ def send_receipt_email(receipt_no, recipient_email, customer_name, pdf_buffer, g
         st.error(f"{error_prefix}: {e}")
         return False
 
+# --- Summary of a bulk import, sent to the internal address instead of one copy per receipt ---
+def send_bulk_summary_email(generator_name, receipt_count, total_amount, zip_bytes, file_name):
+    """Sends the zipped receipts and summary CSV of a bulk import to the internal address."""
+    import smtplib
+    from email.mime.multipart import MIMEMultipart
+    from email.mime.text import MIMEText
+    from email.mime.application import MIMEApplication
+
+    msg = MIMEMultipart()
+    msg['From'] = SENDER_EMAIL
+    msg['To'] = INTERNAL_RECEIVER_EMAIL
+    msg['Subject'] = f"INTERNAL COPY: {receipt_count} Receipts Generated from Bank Statement"
+    body = (
+        f"{receipt_count} Payment Receipts totalling Rs. {total_amount:,.2f} have been generated by "
+        f"{generator_name} from a bank statement import. The PDFs and a summary CSV are attached."
+    )
+    msg.attach(MIMEText(body, 'plain'))
+    attachment = MIMEApplication(zip_bytes, _subtype="zip")
+    attachment.add_header('Content-Disposition', 'attachment', filename=file_name)
+    msg.attach(attachment)
+
+    try:
+        server = smtplib.SMTP(SMTP_SERVER, SMTP_PORT)
+        server.starttls()
+        server.login(SENDER_EMAIL, SENDER_PASSWORD)
+        server.sendmail(SENDER_EMAIL, [INTERNAL_RECEIVER_EMAIL], msg.as_string())
+        server.quit()
+
+        st.success(f"📧 Bulk import summary successfully sent to **{INTERNAL_RECEIVER_EMAIL}** (Internal).")
+        return True
+    except smtplib.SMTPAuthenticationError:
+        st.error("❌ Failed to send bulk import summary: Email authentication failed. Check your SENDER_EMAIL/PASSWORD.")
+        return False
+    except Exception as e:
+        st.error(f"❌ Failed to send bulk import summary: {e}")
+        return False
+
+# --- Default Description ---
+default_description = (
+    "Booking advance for Intelligent Vision Analyser Plus (iVA+)\n"
+    "4th Generation - VR based visual field testing device - complete kit"
+)
+
 # --- UI Layout and Inputs ---
 
 generator_name = st.selectbox(
@@ -187,6 +168,154 @@ generator_name = st.selectbox(
 )
 generator_title = GENERATOR_DETAILS[generator_name]
 
+# --- BULK IMPORT FROM A BANK STATEMENT (replaces the single-receipt form below) ---
+if st.toggle("📥 Bulk import from bank statement", value=False):
+    import pandas as pd
+    from bank_import import (
+        StatementError, MATCHED, AMBIGUOUS, ALREADY_ISSUED, parse_statement, parse_customers, reconcile,
+        issued_references, confirm, generate_receipts, summary_csv, receipts_zip, receipt_file_name
+    )
+    from audit import get_audit_log, read_audit
+
+    st.subheader("Bank Statement Import")
+    statement_file = st.file_uploader("Bank Statement (CSV export)", type=["csv"])
+    customers_file = st.file_uploader(
+        "Customer List (CSV: name, email, address, gstin, reference, expected_amount, description)",
+        type=["csv"]
+    )
+    bulk_description = st.text_area(
+        "Description / Purpose of Payment (for customers without their own)",
+        value=default_description,
+        height=100
+    )
+    if not (statement_file and customers_file):
+        st.info("Upload the bank statement and the customer list to reconcile the credits.")
+        st.stop()
+
+    try:
+        credits = parse_statement(statement_file.getvalue().decode("utf-8-sig"))
+        customers = parse_customers(customers_file.getvalue().decode("utf-8-sig"))
+    except (StatementError, UnicodeDecodeError) as e:
+        st.error(f"❌ Could not read the CSV files: {e}")
+        st.stop()
+    if not credits:
+        st.warning("No credits were found in the bank statement.")
+        st.stop()
+
+    # Customer names label the review dropdown; the email tells duplicate names apart
+    customer_labels = {}
+    for customer in customers:
+        label = customer.name if customer.name not in customer_labels else f"{customer.name} <{customer.email}>"
+        customer_labels.setdefault(label, customer)
+    label_of = {id(customer): label for label, customer in customer_labels.items()}
+
+    # Receipts already issued for these credits (an overlapping statement imported again)
+    try:
+        get_audit_log().flush()
+    except OSError as e:
+        st.warning(f"⚠️ The audit log could not be written ({e}); receipts issued in the last few "
+                   "seconds may not show as already issued.")
+    issued = issued_references(read_audit(event="receipt_generated"))
+    matches = reconcile(credits, customers, issued)
+    counts = {status: sum(1 for m in matches if m.status == status) for status in (MATCHED, AMBIGUOUS, ALREADY_ISSUED)}
+    st.caption(
+        f"{len(matches)} credits: {counts[MATCHED]} matched, {counts[AMBIGUOUS]} ambiguous, "
+        f"{len(matches) - sum(counts.values())} unmatched, {counts[ALREADY_ISSUED]} already issued. "
+        "Pick the customer for ambiguous and unmatched credits, or untick them to skip. "
+        "Credits already issued are never issued again, even if ticked."
+    )
+    review = st.data_editor(
+        pd.DataFrame([{
+            "Issue": m.status == MATCHED,
+            "Date": m.credit.date.strftime("%d/%m/%Y"),
+            "Amount": m.credit.amount,
+            "Mode": m.credit.mode,
+            "Reference": m.credit.reference or m.credit.narration,
+            "Match": f"{m.status} ({m.basis})" if m.basis else m.status,
+            "Customer": label_of.get(id(m.customer)),
+            "Candidates": ", ".join(label_of.get(id(c), c.name) for c in m.candidates),
+        } for m in matches]),
+        column_config={
+            "Issue": st.column_config.CheckboxColumn("Issue"),
+            "Amount": st.column_config.NumberColumn("Amount (INR)", format="%.2f"),
+            "Customer": st.column_config.SelectboxColumn("Customer", options=list(customer_labels)),
+        },
+        disabled=["Date", "Amount", "Mode", "Reference", "Match", "Candidates"],
+        hide_index=True,
+        key=f"bulk_review_{statement_file.file_id}_{customers_file.file_id}",
+    )
+
+    confirmed, skipped = confirm(matches, [(row["Issue"], customer_labels.get(row["Customer"]))
+                                           for _, row in review.iterrows()])
+
+    start_prewarm()
+
+    if st.button(f"Generate {len(confirmed)} Payment Receipts", disabled=not confirmed):
+        from signing import signing_enabled, sign_many
+
+        with st.spinner(f"Generating {len(confirmed)} receipts..."):
+            profile_this_run = profiling_enabled() or st.query_params.get("profile") == "1"
+            with profile_generation("receipt_bulk_import", enabled=profile_this_run) as profile_report:
+                receipts = generate_receipts(confirmed, generator_name, generator_title, bulk_description)
+        if profile_report:
+            st.caption(f"🔬 Profile saved to `{profile_report['prof']}` (report: `{profile_report['report']}`)")
+
+        # --- OPTIONAL DIGITAL SIGNATURE (PAdES, one key load per worker) ---
+        pdf_signed = signing_enabled()
+        if pdf_signed:
+            try:
+                signed = sign_many((r.pdf, f"Payment Receipt {r.receipt_no}") for r in receipts)
+            except Exception as e:
+                st.error(f"❌ Digital signing failed: {e}")
+                st.stop()
+            receipts = [r._replace(pdf=pdf) for r, pdf in zip(receipts, signed)]
+            st.caption("🔏 PDFs digitally signed.")
+
+        summary = summary_csv(receipts, skipped)
+        bundle = receipts_zip(receipts, summary)
+        bundle_name = f"Alfaleus_Receipts_{receipts[0].receipt_no.replace('/', '_')}_to_{receipts[-1].receipt_no.rsplit('/', 1)[1]}.zip"
+        total_amount = sum(r.credit.amount for r in receipts)
+
+        internal_sent = send_bulk_summary_email(generator_name, len(receipts), total_amount, bundle, bundle_name)
+
+        # --- AUDIT TRAIL (group-committed: one fsync for the whole batch) ---
+        audit_log = get_audit_log()
+        for r in receipts:
+            audit_log.record(
+                "receipt_generated", doc_no=r.receipt_no, generated_by=generator_name,
+                customer_name=r.customer.name, customer_email=r.customer.email, gstin=r.customer.gstin,
+                amount=round(r.credit.amount, 2),
+                mode_of_payment=r.credit.mode, reference_details=r.credit.reference or r.credit.narration,
+                pdf_sha256=hashlib.sha256(r.pdf).hexdigest(),
+                signed=pdf_signed, source="bank_import", statement_row=r.credit.row,
+                internal_email_sent=internal_sent, customer_email_sent=None
+            )
+
+        st.success(
+            f"✅ Issued {len(receipts)} receipts ({receipts[0].receipt_no} to {receipts[-1].receipt_no}) "
+            f"totalling Rs. {total_amount:,.2f}; {len(skipped)} credits skipped."
+        )
+        st.dataframe(
+            pd.DataFrame([{
+                "Receipt No.": r.receipt_no, "Customer": r.customer.name,
+                "Amount": r.credit.amount, "Mode": r.credit.mode, "File": receipt_file_name(r.receipt_no),
+            } for r in receipts]),
+            hide_index=True
+        )
+        st.download_button(
+            label="🗂️ Download Receipts and Summary (ZIP)",
+            data=bundle,
+            file_name=bundle_name,
+            mime="application/zip"
+        )
+        st.download_button(
+            label="📊 Download Summary (CSV)",
+            data=summary,
+            file_name=bundle_name.replace(".zip", "_summary.csv"),
+            mime="text/csv"
+        )
+    st.stop()
+
 st.subheader("Customer Details")
 customer_name = st.text_input("Customer Name (Payer)")
 customer_email = st.text_input("Customer Email")
@@ -219,21 +348,30 @@ amount_received = st.number_input(
     format="%.2f"
 )
 
-# --- Default Description ---
-default_description = (
-    "Booking advance for Intelligent Vision Analyser Plus (iVA+)\n"
-    "4th Generation - VR based visual field testing device - complete kit"
-)
 product_description = st.text_area(
     "Description / Purpose of Payment",
     value=default_description,
     height=100
 )
 
+# --- LIVE PREVIEW (draft number, the receipt counter is not touched) ---
+if st.checkbox("👁️ Live preview", value=False):
+    from documents import render_receipt
+    show_preview("receipt", render_receipt, dict(
+        receipt_no="REC/DRAFT", receipt_date_str=receipt_date.strftime("%d/%m/%Y"),
+        customer_name=customer_name, customer_email=customer_email, address=address, gstin=gstin,
+        product_description=product_description, mode_of_payment=mode_of_payment,
+        reference_details=reference_details, amount_received=amount_received,
+        generator_name=generator_name, generator_title=generator_title
+    ))
+
 st.divider()
 
 send_to_customer = st.checkbox(" Send a copy directly to the Customer Email", value=False) 
 
+# The form is on screen: load the PDF/email stack in the background for the first Generate
+start_prewarm()
+
 if st.button("Generate Payment Receipt PDF and Send Emails"):
     
     # Input validation
@@ -244,181 +382,38 @@ if st.button("Generate Payment Receipt PDF and Send Emails"):
         st.error("Please enter the **Customer Email** to send the receipt.")
         st.stop()
         
-    # Clear the temporary session state key to force counter increment
-    if 'current_receipt_num' in st.session_state:
-        del st.session_state['current_receipt_num']
-        
     # Generate the sequential receipt number
     receipt_no = get_next_receipt_number(receipt_date)
     receipt_date_str = receipt_date.strftime("%d/%m/%Y")
 
-    buffer = io.BytesIO()
-    c = canvas.Canvas(buffer, pagesize=A4)
-    
-    # --- PDF Generation Logic ---
-    styles = getSampleStyleSheet()
-    para_style = ParagraphStyle(
-        'Normal_Left',
-        parent=styles['Normal'],
-        fontName='Helvetica',
-        fontSize=10,
-        leading=14,
-        alignment=TA_LEFT
-    )
+    from documents import render_receipt, pdf_size_report
+    from audit import get_audit_log
+    from signing import signing_enabled, sign_pdf
 
-    c.rect(BORDER_MARGIN, BORDER_MARGIN, WIDTH - 2 * BORDER_MARGIN, HEIGHT - 2 * BORDER_MARGIN)
-
-    # Header
-    c.setFillColor(HexColor('#255290'))
-    c.setFont("Helvetica-Bold", 12)
-    c.drawCentredString(WIDTH / 2, HEIGHT - 40, "ALFALEUS TECHNOLOGY PRIVATE LIMITED")
-    c.setFillColorRGB(0, 0, 0)
-    c.setFont("Helvetica", 9)
-    c.drawCentredString(WIDTH / 2, HEIGHT - 55,
-        "Registered Office : II Floor, 654, Vivek Vihar, New Sanganare Road, Jaipur, Rajasthan - 302019")
-    c.drawCentredString(WIDTH / 2, HEIGHT - 68,
-        "CIN : U74999RJ2018PTC060255 | Mail : info@alfaleus.com | Contact : +91 96550 42547")
-
-    # Receipt Title
-    c.setFont("Helvetica-Bold", 14)
-    c.drawCentredString(WIDTH / 2, HEIGHT - 110, "OFFICIAL PAYMENT RECEIPT")
-
-    # Receipt Info
-    y = HEIGHT - 140
-    
-    # Receipt Number and Date
-    c.setFont("Helvetica-Bold", 11)
-    c.drawString(50, y, "Receipt No:")
-    c.setFont("Helvetica", 11)
-    c.drawString(130, y, receipt_no)
-    
-    c.setFont("Helvetica-Bold", 11)
-    c.drawRightString(WIDTH - 150, y, "Date:")
-    c.setFont("Helvetica", 11)
-    c.drawRightString(WIDTH - 50, y, receipt_date_str)
-    
-    y -= 40 # Spacing after Receipt Date
-    
-    # Payer Info (Customer Details)
-    c.setFont("Helvetica-Bold", 11)
-    c.drawString(50, y, "RECEIVED FROM")
-    c.line(50, y - 2, WIDTH - 50, y - 2)
-    y -= 15
-    
-    c.setFont("Helvetica-Bold", 10) 
-    bold_label = "Name : "
-    c.drawString(50, y, bold_label)
-    label_width = c.stringWidth(bold_label, "Helvetica-Bold", 10)
-    c.setFont("Helvetica-Bold", 10) 
-    c.drawString(50 + label_width, y, customer_name)
-    c.setFont("Helvetica", 10)
-    y -= 15
-    c.drawString(50, y, f"Email : {customer_email}")
-    y -= 15
-    address_text = address.replace('\n', '<br/>')
-    address_para = Paragraph(f"Address : {address_text}", para_style)
-    w_addr, h_addr = address_para.wrapOn(c, WIDTH - 100, HEIGHT) 
-    address_para.drawOn(c, 50, y - h_addr)
-    y -= (h_addr + 15) 
-    c.drawString(50, y, f"GSTIN : {gstin}")
-    y -= 30
-
-    # Payment Details Table
-    c.setFont("Helvetica-Bold", 11)
-    c.drawString(50, y, "PAYMENT INFORMATION")
-    y -= 20
-    
-    # Table Headers
-    c.setFont("Helvetica-Bold", 10)
-    c.drawString(50, y, "S No.")
-    c.drawString(90, y, "Description / Purpose")
-    c.drawString(420, y, "Mode of Payment") 
-    c.drawString(510, y, "Amount (Rs.)") 
-    y -= 10
-    c.line(50, y, 550, y)
-    y -= 15
-    
-    # Table Content - Description
-    c.setFont("Helvetica", 10)
-    c.drawString(55, y, "1")
-    desc_text = product_description.replace('\n', '<br/>')
-    desc_para = Paragraph(desc_text, para_style)
-    w_desc, h_desc = desc_para.wrapOn(c, 320, HEIGHT) 
-    y_start_desc = y - (h_desc - 10) 
-    desc_para.drawOn(c, 90, y_start_desc)
-    
-    # Table Content - Payment Details
-    c.drawString(420, y, mode_of_payment) 
-    c.drawRightString(550, y, f"{amount_received:,.2f}") 
-    y = y_start_desc - 15
-
-    # Reference Details
-    c.setFont("Helvetica-Bold", 10)
-    c.drawString(50, y, "Reference/Txn Details:")
-    c.setFont("Helvetica", 10)
-    c.drawString(180, y, reference_details)
-    
-    y -= 40 # Spacing above Total
-
-    # Total Amount Received Section
-    c.setFont("Helvetica-Bold", 12)
-    c.drawString(300, y, "TOTAL AMOUNT RECEIVED:")
-    c.drawRightString(550, y, f"Rs. {amount_received:,.2f}")
-    
-    # Amount in Words
-    y -= 30
-    words = num2words(round(amount_received), lang='en_IN').title()
-    bold_value = "Value in words"
-    normal_text_words = f": Rupees {words} Only."
-    c.setFont("Helvetica-Bold", 10)
-    c.drawString(50, y, bold_value)
-    words_width = c.stringWidth(bold_value, "Helvetica-Bold", 10)
-    c.setFont("Helvetica", 10)
-    c.drawString(50 + words_width, y, normal_text_words)
-
-    # Note / Declaration
-    y -= 40
-    c.setFont("Helvetica-Bold", 10)
-    c.drawString(50, y, "Note:")
-    y -= 15
-    c.setFont("Helvetica", 10)
-    c.drawString(50, y, "This receipt acknowledges payment towards the specified purpose and details above.")
-    y -= 15
-    c.drawString(50, y, "Currency is Indian Rupees (INR) unless otherwise specified.")
-    
-    # NEW CHANGE: Add "Payment received by"
-    y -= 15 
-    c.setFont("Helvetica-Bold", 10)
-    bold_label_received = "Payment received by:"
-    c.drawString(50, y, bold_label_received)
-    received_by_width = c.stringWidth(bold_label_received, "Helvetica-Bold", 10)
-    c.setFont("Helvetica", 10)
-    c.drawString(50 + received_by_width + 5, y, generator_name) # Uses the generator's name
-    y -= 30 # Extra spacing before the signature block
-
-    # Signature (Right-Aligned) - Issued By
-    # MOVED CHANGE: Move signature block down after the note section
-    RIGHT_POS = WIDTH - 50 
-    
-    c.setFont("Helvetica", 10)
-    c.drawRightString(RIGHT_POS, y, f"For Alfaleus Technology Pvt. Ltd")
-    y -= 15
-    c.setFont("Helvetica-Bold", 10)
-    c.drawRightString(RIGHT_POS, y, generator_name) # Signature Name
-    c.setFont("Helvetica", 9)
-    c.drawRightString(RIGHT_POS, y - 12, generator_title) # Signature Title
-
-
-    # Footer (position adjusted to stay near the bottom margin)
-    c.setFont("Helvetica-Oblique", 9)
-    c.drawString(50, BORDER_MARGIN + 15,
-        "This is a computer generated receipt and does not require physical signature. "
-        "For any queries, contact info@alfaleus.com")
-
-    # ---- Save PDF to buffer ----
-    c.showPage()
-    c.save()
-    buffer.seek(0)
+    profile_this_run = profiling_enabled() or st.query_params.get("profile") == "1"
+    with profile_generation(f"receipt_{receipt_no}", enabled=profile_this_run) as profile_report:
+        buffer = render_receipt(
+            receipt_no, receipt_date_str, customer_name, customer_email, address, gstin,
+            product_description, mode_of_payment, reference_details, amount_received,
+            generator_name, generator_title
+        )
+    if profile_report:
+        st.caption(f"🔬 Profile saved to `{profile_report['prof']}` (report: `{profile_report['report']}`)")
+
+    # --- OPTIONAL DIGITAL SIGNATURE (PAdES, key loaded once per process) ---
+    pdf_signed = signing_enabled()
+    if pdf_signed:
+        try:
+            buffer = BytesIO(sign_pdf(buffer.getvalue(), reason=f"Payment Receipt {receipt_no}"))
+        except Exception as e:
+            st.error(f"❌ Digital signing failed: {e}")
+            st.stop()
+        st.caption("🔏 PDF digitally signed.")
+
+    pdf_size_kb, within_budget = pdf_size_report(buffer)
+    st.caption(f"Receipt PDF size: {pdf_size_kb:,.1f} KiB")
+    if not within_budget:
+        st.warning(f"⚠️ The PDF is {pdf_size_kb:,.1f} KiB, which exceeds the configured size budget.")
     
     # --- DYNAMIC CC LOGIC ---
     primary_cc = PRIMARY_CC_MAPPING.get(generator_name)
@@ -431,16 +426,28 @@ if st.button("Generate Payment Receipt PDF and Send Emails"):
 
     # --- EMAIL THE PDF COPY ---
     # 1. Send internal copy (always)
-    send_receipt_email(receipt_no, INTERNAL_RECEIVER_EMAIL, customer_name, buffer, generator_name, is_customer_send=False)
+    internal_sent = send_receipt_email(receipt_no, INTERNAL_RECEIVER_EMAIL, customer_name, buffer, generator_name, is_customer_send=False)
     
     # Reset buffer for the second email
     buffer.seek(0) 
 
     # 2. Send to customer (if checked and email provided)
+    customer_sent = None # Not requested
     if send_to_customer and customer_email:
-        send_receipt_email(receipt_no, customer_email, customer_name, buffer, generator_name, final_cc_list, is_customer_send=True)
+        customer_sent = send_receipt_email(receipt_no, customer_email, customer_name, buffer, generator_name, final_cc_list, is_customer_send=True)
     # --------------------------
 
+    # --- AUDIT TRAIL (append-only, group-committed) ---
+    get_audit_log().record(
+        "receipt_generated", doc_no=receipt_no, generated_by=generator_name,
+        customer_name=customer_name, customer_email=customer_email, gstin=gstin,
+        amount=round(amount_received, 2),
+        mode_of_payment=mode_of_payment, reference_details=reference_details,
+        pdf_sha256=hashlib.sha256(buffer.getvalue()).hexdigest(),
+        signed=pdf_signed,
+        internal_email_sent=internal_sent, customer_email_sent=customer_sent
+    )
+
     # ---- Download Button ----
     st.download_button(
         label="📄 Download Payment Receipt PDF",
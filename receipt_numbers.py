@@ -0,0 +1,43 @@
+"""Sequential receipt numbers, persisted in a counter file.
+
+Numbers look like REC/<ddmmyy>/<counter:04d>; the counter keeps counting
+across dates and restarts of the app. allocate_receipt_numbers() reserves a
+whole block under an exclusive file lock with a single read and a single
+write, so a bulk import and someone issuing a receipt by hand at the same
+time never get the same number.
+"""
+import os
+
+from file_lock import file_lock
+
+# File path where the last serial number is stored
+COUNTER_FILE = os.getenv("ALFA_RECEIPT_COUNTER_FILE", "last_receipt_num.txt")
+INITIAL_COUNTER_VALUE = 99  # The number *before* the first desired receipt (0100)
+
+
+def read_last_counter(path=COUNTER_FILE):
+    """Returns the last issued counter value, or INITIAL_COUNTER_VALUE if there is none yet."""
+    try:
+        with open(path, "r") as f:
+            return int(f.read().strip())
+    except (FileNotFoundError, ValueError):
+        return INITIAL_COUNTER_VALUE
+
+
+def allocate_receipt_numbers(count, path=COUNTER_FILE):
+    """Reserves `count` consecutive counter values and returns them as a range."""
+    if count < 1:
+        return range(0)
+    with file_lock(path):
+        last = read_last_counter(path)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(str(last + count))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    return range(last + 1, last + count + 1)
+
+
+def format_receipt_number(date, counter):
+    return f"REC/{date.strftime('%d%m%y')}/{counter:04d}"
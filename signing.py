@@ -0,0 +1,111 @@
+"""Optional PAdES digital signing of rendered quotations and receipts.
+
+Signing is switched on by pointing ALFA_SIGNING_KEY and ALFA_SIGNING_CERT at a
+PEM private key and certificate (ALFA_SIGNING_CHAIN may list extra CA
+certificates, separated by os.pathsep; ALFA_SIGNING_KEY_PASSPHRASE unlocks an
+encrypted key). It needs the optional `pyhanko` package.
+
+The key and certificate are loaded and parsed once per process. sign_many()
+signs a batch across a pool of worker processes, each of which loads the key
+once in its initializer, so signing does not serialize batch throughput.
+"""
+import io
+import os
+from functools import lru_cache
+
+from worker_pool import map_in_processes
+
+SIGNING_KEY = os.getenv("ALFA_SIGNING_KEY")
+SIGNING_CERT = os.getenv("ALFA_SIGNING_CERT")
+SIGNING_CHAIN = tuple(p for p in os.getenv("ALFA_SIGNING_CHAIN", "").split(os.pathsep) if p)
+SIGNING_KEY_PASSPHRASE = os.getenv("ALFA_SIGNING_KEY_PASSPHRASE")
+SIGNING_WORKERS = int(os.getenv("ALFA_SIGNING_WORKERS", str(os.cpu_count() or 1)))
+SIGNATURE_LOCATION = os.getenv("ALFA_SIGNING_LOCATION", "Hyderabad, India")
+
+
+class SigningError(RuntimeError):
+    """Raised when signing is requested but cannot be carried out."""
+
+
+def signing_enabled():
+    """True when a signing key and certificate are configured."""
+    return bool(SIGNING_KEY and SIGNING_CERT)
+
+
+def _resolve(key_path, cert_path, chain, passphrase):
+    """Fills in the ALFA_SIGNING_* defaults, so equal settings share one cache entry."""
+    return (key_path or SIGNING_KEY,
+            cert_path or SIGNING_CERT,
+            SIGNING_CHAIN if chain is None else tuple(chain),
+            passphrase if passphrase is not None else SIGNING_KEY_PASSPHRASE)
+
+
+def load_signer(key_path=None, cert_path=None, chain=None, passphrase=None):
+    """Loads and parses the signing key material; cached for the life of the process."""
+    return _load_signer(*_resolve(key_path, cert_path, chain, passphrase))
+
+
+@lru_cache(maxsize=4)
+def _load_signer(key_path, cert_path, chain, passphrase):
+    try:
+        from pyhanko.sign import signers
+    except ImportError as e:
+        raise SigningError("Digital signing needs the 'pyhanko' package (pip install pyhanko).") from e
+    if not (key_path and cert_path):
+        raise SigningError("Set ALFA_SIGNING_KEY and ALFA_SIGNING_CERT to enable digital signing.")
+    signer = signers.SimpleSigner.load(
+        key_path, cert_path, ca_chain_files=chain or None,
+        key_passphrase=passphrase.encode() if isinstance(passphrase, str) else passphrase
+    )
+    if signer is None:
+        raise SigningError(f"Could not load signing key {key_path} / certificate {cert_path}.")
+    return signer
+
+
+def sign_pdf(pdf_bytes, reason, signer=None, location=SIGNATURE_LOCATION):
+    """Returns `pdf_bytes` with a PAdES signature appended as an incremental update."""
+    from pyhanko.pdf_utils.incremental_writer import IncrementalPdfFileWriter
+    from pyhanko.sign import signers, fields
+
+    if signer is None:
+        signer = load_signer()
+    writer = IncrementalPdfFileWriter(io.BytesIO(pdf_bytes))
+    meta = signers.PdfSignatureMetadata(
+        field_name="Signature",
+        reason=reason,
+        location=location,
+        subfilter=fields.SigSeedSubFilter.PADES,
+        md_algorithm="sha256",
+    )
+    return signers.sign_pdf(writer, meta, signer=signer).getvalue()
+
+
+# --- Batch signing across worker processes ---
+_worker_signer = None
+
+
+def _init_worker(key_path, cert_path, chain, passphrase):
+    global _worker_signer
+    _worker_signer = load_signer(key_path, cert_path, chain, passphrase)
+
+
+def _sign_in_worker(job):
+    pdf_bytes, reason = job
+    return sign_pdf(pdf_bytes, reason, signer=_worker_signer)
+
+
+def sign_many(jobs, key_path=None, cert_path=None, chain=None, passphrase=None, max_workers=None):
+    """Signs (pdf_bytes, reason) jobs in parallel and returns the signed PDFs in order.
+
+    Each worker process parses the key once; a single job is signed in-process.
+    """
+    jobs = list(jobs)
+    key_path, cert_path, chain, passphrase = _resolve(key_path, cert_path, chain, passphrase)
+    workers = min(max_workers or SIGNING_WORKERS, len(jobs))
+    if workers <= 1:
+        signer = load_signer(key_path, cert_path, chain, passphrase)
+        return [sign_pdf(pdf_bytes, reason, signer=signer) for pdf_bytes, reason in jobs]
+    # Fail fast in the parent rather than in every worker
+    load_signer(key_path, cert_path, chain, passphrase)
+    return map_in_processes(_sign_in_worker, jobs, workers, initializer=_init_worker,
+                            initargs=(key_path, cert_path, chain, passphrase))
@@ -0,0 +1,28 @@
+"""Reads rendered PDFs back in the tests, without a PDF library."""
+import re
+import zlib
+
+from reportlab.pdfbase.pdfutils import asciiBase85Decode
+
+_STREAM = re.compile(rb"\bobj\s*<<((?:(?!endobj).)*?)>>\s*stream\r?\n(.*?)endstream", re.S)
+
+
+def content_streams(pdf, forms=True):
+    """Decoded streams in file order: page contents, and form XObjects unless forms=False."""
+    streams = []
+    for dictionary, data in _STREAM.findall(pdf):
+        if not forms and b"/Subtype /Form" in dictionary:
+            continue
+        data = data.strip()
+        if b"/ASCII85Decode" in dictionary:
+            data = asciiBase85Decode(data)
+        if b"/FlateDecode" in dictionary:
+            data = zlib.decompress(data)
+        streams.append(data)
+    return streams
+
+
+def info_field(pdf, name):
+    """Raw value of an entry such as /CreationDate or /ID, or None if it is missing."""
+    match = re.search(rb"/" + name.encode() + rb"\s*(\([^)]*\)|\[[^\]]*\])", pdf)
+    return match.group(1) if match else None
@@ -0,0 +1,189 @@
+"""Audit journal: group commit, failure recovery, rotation, compaction and reading back."""
+import gzip
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+import audit
+from audit import AuditLog, compact_segments, read_audit
+
+
+def _wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return predicate()
+
+
+def _lines(path):
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_batch_is_committed_when_the_group_is_full(tmp_path):
+    path = str(tmp_path / "audit.jsonl")
+    log = AuditLog(path, group_size=3, max_delay_s=60)
+    try:
+        log.record("receipt_generated", doc_no="1")
+        log.record("receipt_generated", doc_no="2")
+        time.sleep(0.1)
+        assert _lines(path) == []
+        log.record("receipt_generated", doc_no="3")
+        assert _wait_for(lambda: len(_lines(path)) == 3)
+    finally:
+        log.close()
+
+
+def test_batch_is_committed_after_the_max_delay(tmp_path):
+    path = str(tmp_path / "audit.jsonl")
+    log = AuditLog(path, group_size=100, max_delay_s=0.05)
+    try:
+        log.record("quotation_generated", doc_no="AT/QT/001")
+        assert _wait_for(lambda: [r["doc_no"] for r in _lines(path)] == ["AT/QT/001"])
+    finally:
+        log.close()
+
+
+def test_flush_and_close_write_everything_in_order(tmp_path):
+    path = str(tmp_path / "audit.jsonl")
+    log = AuditLog(path, group_size=100, max_delay_s=60)
+    log.record("receipt_generated", doc_no="1")
+    log.flush()
+    assert [r["doc_no"] for r in _lines(path)] == ["1"]
+    log.record("receipt_generated", doc_no="2")
+    log.close()
+    assert [r["doc_no"] for r in _lines(path)] == ["1", "2"]
+    with pytest.raises(RuntimeError, match="closed"):
+        log.record("receipt_generated", doc_no="3")
+
+
+def test_failed_write_is_retried_and_the_flusher_keeps_running(tmp_path, monkeypatch):
+    path = str(tmp_path / "audit.jsonl")
+    log = AuditLog(path, group_size=1, max_delay_s=0.05)
+    append = log._append
+    failures = []
+
+    def flaky_append(batch):
+        if not failures:
+            failures.append(batch)
+            raise OSError(28, "No space left on device")
+        append(batch)
+
+    monkeypatch.setattr(log, "_append", flaky_append)
+    try:
+        log.record("receipt_generated", doc_no="1")
+        log.record("receipt_generated", doc_no="2")
+        assert _wait_for(lambda: [r["doc_no"] for r in _lines(path)] == ["1", "2"])
+        assert failures
+        assert _wait_for(lambda: log.last_error is None)
+        log.record("receipt_generated", doc_no="3")
+        assert _wait_for(lambda: len(_lines(path)) == 3)
+    finally:
+        log.close()
+
+
+def test_flush_reports_a_failed_write_and_keeps_the_records(tmp_path, monkeypatch):
+    path = str(tmp_path / "audit.jsonl")
+    log = AuditLog(path, group_size=100, max_delay_s=60)
+    append = log._append
+
+    def failing_append(batch):
+        raise OSError(28, "No space left on device")
+
+    log.record("receipt_generated", doc_no="1")
+    monkeypatch.setattr(log, "_append", failing_append)
+    with pytest.raises(OSError):
+        log.flush()
+    assert isinstance(log.last_error, OSError)
+    monkeypatch.setattr(log, "_append", append)
+    log.close()
+    assert [r["doc_no"] for r in _lines(path)] == ["1"]
+
+
+def test_record_reports_a_dead_flusher(tmp_path):
+    log = AuditLog(str(tmp_path / "audit.jsonl"), group_size=100, max_delay_s=60)
+    with log._cond:
+        log._closed = True
+        log._cond.notify()
+    log._flusher.join()
+    log._closed = False
+    with pytest.raises(RuntimeError, match="flusher has stopped"):
+        log.record("receipt_generated", doc_no="1")
+
+
+def test_rotation_and_compaction_keep_every_record_once(tmp_path):
+    path = str(tmp_path / "audit.jsonl")
+    log = AuditLog(path, group_size=100, max_delay_s=60, rotate_bytes=200)
+    for n in range(12):
+        log.record("receipt_generated", doc_no=f"REC/{n:04d}", reference_details="x" * 100)
+        log.flush()
+        time.sleep(0.002)  # distinct segment names
+    log.close()
+
+    names = sorted(os.listdir(tmp_path))
+    assert any(name.endswith(".jsonl.gz") for name in names)
+    assert not any(name.endswith(".tmp") for name in names)
+    # Only the newest rotated segment is left uncompressed
+    assert len([name for name in names if name.startswith("audit-") and name.endswith(".jsonl")]) == 1
+    assert [r["doc_no"] for r in read_audit(path)] == [f"REC/{n:04d}" for n in range(12)]
+
+
+def test_concurrent_compaction_is_safe(tmp_path):
+    path = str(tmp_path / "audit.jsonl")
+    stem = str(tmp_path / "audit")
+    for n in range(6):
+        with open(f"{stem}-2025010{n + 1}T000000000000.jsonl", "w", encoding="utf-8") as f:
+            f.write(json.dumps({"ts": "2025-01-01T00:00:00.000+05:30", "event": "e", "n": n}) + "\n")
+
+    errors = []
+
+    def compact():
+        try:
+            compact_segments(path)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=compact) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert errors == []
+    assert [r["n"] for r in read_audit(path)] == list(range(6))
+
+
+def test_segment_compacted_but_not_yet_removed_is_read_once(tmp_path):
+    path = str(tmp_path / "audit.jsonl")
+    segment = str(tmp_path / "audit-20250101T000000000000.jsonl")
+    line = json.dumps({"ts": "2025-01-01T00:00:00.000+05:30", "event": "e", "n": 1}) + "\n"
+    with open(segment, "w", encoding="utf-8") as f:
+        f.write(line)
+    with gzip.open(segment + ".gz", "wt", encoding="utf-8") as f:
+        f.write(line)
+    assert [r["n"] for r in read_audit(path)] == [1]
+
+
+def test_read_since_skips_older_segments_and_records(tmp_path):
+    path = str(tmp_path / "audit.jsonl")
+    now = datetime.now().astimezone()
+    old_end = (now - timedelta(days=10)).replace(tzinfo=None)
+    # Not valid gzip: the test fails if read_audit opens this segment
+    with open(str(tmp_path / f"audit-{old_end.strftime(audit._SEGMENT_TIME_FORMAT)}.jsonl.gz"), "wb") as f:
+        f.write(b"not gzip")
+    with open(path, "w", encoding="utf-8") as f:
+        for days, n in ((3, "old"), (0, "new")):
+            ts = (now - timedelta(days=days)).isoformat(timespec="milliseconds")
+            f.write(json.dumps({"ts": ts, "event": "receipt_generated", "doc_no": n}) + "\n")
+
+    since = now - timedelta(days=1)
+    assert [r["doc_no"] for r in read_audit(path, since=since)] == ["new"]
+    assert [r["doc_no"] for r in read_audit(path, since=since, event="receipt_generated", contains="new")] == ["new"]
+    assert list(read_audit(path, since=since, event="quotation_generated")) == []
@@ -0,0 +1,65 @@
+"""Bank statement parsing and reconciliation."""
+import datetime
+
+from audit import AuditLog, read_audit
+from bank_import import (MATCHED, ALREADY_ISSUED, Customer, parse_statement, reconcile, issued_references,
+                         summary_csv, confirm, generate_receipts)
+
+SBI_STATEMENT = """Account Name :,ALFA CUSTOMER
+Account Number :,00000012345678901
+Txn Date,Value Date,Description,Ref No./Cheque No.,Debit,Credit,Balance
+01 Jan 2025,01 Jan 2025,NEFT-SBIN125001234567-ACME LABS,SBIN125001234567,,"1,18,000.00","2,18,000.00"
+02 Jan 2025,02 Jan 2025,ATM WDL,,"2,000.00",,"2,16,000.00"
+"""
+
+
+def test_sbi_reference_column():
+    credits = parse_statement(SBI_STATEMENT)
+    assert len(credits) == 1
+    credit = credits[0]
+    assert credit.date == datetime.date(2025, 1, 1)
+    assert credit.amount == 118000.0
+    assert credit.reference == "SBIN125001234567"
+    assert credit.mode == "Bank Transfer"
+
+
+def test_reimported_credit_is_already_issued(tmp_path):
+    path = str(tmp_path / "audit.jsonl")
+    log = AuditLog(path)
+    log.record("receipt_generated", doc_no="REC/010125/0100", reference_details="SBIN125001234567",
+               source="bank_import")
+    log.record("quotation_generated", doc_no="AT/QT/001", reference_details="SBIN999")
+    log.close()
+
+    credits = parse_statement(SBI_STATEMENT)
+    customers = [Customer("Acme Labs", "accounts@acme.example", "", "", "SBIN125001234567", None, "")]
+    assert reconcile(credits, customers)[0].status == MATCHED
+
+    issued = issued_references(read_audit(path, event="receipt_generated"))
+    assert issued == {"SBIN125001234567": "REC/010125/0100"}
+    match = reconcile(credits, customers, issued)[0]
+    assert match.status == ALREADY_ISSUED
+    assert match.basis == "REC/010125/0100"
+    assert "already issued,REC/010125/0100," in summary_csv([], [match])
+
+
+def test_already_issued_credit_is_never_confirmed():
+    credits = parse_statement(SBI_STATEMENT)
+    customer = Customer("Acme Labs", "accounts@acme.example", "", "", "SBIN125001234567", None, "")
+    match = reconcile(credits, [customer], {"SBIN125001234567": "REC/010125/0100"})[0]
+    assert match.status == ALREADY_ISSUED
+
+    # Ticked in the review, with the customer picked
+    confirmed, skipped = confirm([match], [(True, customer)])
+    assert confirmed == []
+    assert skipped == [match]
+    assert generate_receipts(confirmed, "Kiran Shukla", "Head of Sales", "Booking advance") == []
+
+
+def test_confirm_needs_a_tick_and_a_customer():
+    credits = parse_statement(SBI_STATEMENT)
+    customer = Customer("Acme Labs", "accounts@acme.example", "", "", "SBIN125001234567", None, "")
+    match = reconcile(credits, [customer])[0]
+    assert confirm([match], [(True, customer)]) == ([(match.credit, customer)], [])
+    assert confirm([match], [(False, customer)]) == ([], [match])
+    assert confirm([match], [(True, None)]) == ([], [match])
@@ -0,0 +1,85 @@
+"""config.toml validation and reload."""
+import copy
+import os
+
+import pytest
+
+import config
+from config import ConfigError, parse_config
+
+try:
+    import tomllib
+except ModuleNotFoundError:  # Python < 3.11
+    import tomli as tomllib
+
+REPO_CONFIG = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "config.toml")
+
+
+@pytest.fixture
+def data():
+    with open(REPO_CONFIG, "rb") as f:
+        return tomllib.load(f)
+
+
+def test_repo_config_is_valid(data):
+    parsed = parse_config(data)
+    assert parsed.company["name"]
+    assert parsed.rate_per_unit_min <= parsed.rate_per_unit_max
+
+
+@pytest.mark.parametrize("change, message", [
+    (lambda d: d.pop("company"), "missing 'company'"),
+    (lambda d: d["company"].pop("cin"), r"\[company\]: missing 'cin'"),
+    (lambda d: d["company"].update(name="  "), "'name' must not be empty"),
+    (lambda d: d["company"].update(sales_email="sales.example.com"), "is not an email address"),
+    (lambda d: d["email"].update(smtp_port="587"), "'smtp_port' must be int, got str"),
+    (lambda d: d["email"].update(smtp_port=70000), "out of range"),
+    (lambda d: d["email"].update(secondary_cc=[42]), "list of email addresses"),
+    (lambda d: d["pricing"].update(rate_per_unit_min=5e5, rate_per_unit_max=4e5),
+     "rate_per_unit_min <= rate_per_unit_max"),
+    (lambda d: d.update(generators=[]), "at least one generator"),
+    (lambda d: d["generators"].append(dict(d["generators"][0])), "duplicate generator"),
+])
+def test_invalid_config_is_rejected(data, change, message):
+    data = copy.deepcopy(data)
+    change(data)
+    with pytest.raises(ConfigError, match=message):
+        parse_config(data)
+
+
+def test_reloads_only_when_the_file_changes(tmp_path, monkeypatch):
+    path = tmp_path / "config.toml"
+    with open(REPO_CONFIG, encoding="utf-8") as f:
+        original = f.read()
+    path.write_text(original, encoding="utf-8")
+    monkeypatch.setattr(config, "CONFIG_PATH", str(path))
+    monkeypatch.setattr(config, "_cache", {"mtime": None, "config": None})
+
+    first = config.get_config()
+    assert config.get_config() is first
+
+    path.write_text(original.replace('smtp_port = 587', 'smtp_port = 465'), encoding="utf-8")
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    reloaded = config.get_config()
+    assert reloaded is not first
+    assert reloaded.smtp_port == 465
+    assert config.get_config() is reloaded
+
+
+def test_missing_file_is_a_config_error(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "CONFIG_PATH", str(tmp_path / "missing.toml"))
+    with pytest.raises(ConfigError, match="Cannot read config file"):
+        config.get_config()
+
+
+@pytest.mark.parametrize("value, expected", [
+    (None, True), ("1", True), (" Yes ", True), ("on", True), ("TRUE", True),
+    ("0", False), ("off", False), ("", False),
+])
+def test_env_flag(monkeypatch, value, expected):
+    if value is None:
+        monkeypatch.delenv("ALFA_TEST_FLAG", raising=False)
+    else:
+        monkeypatch.setenv("ALFA_TEST_FLAG", value)
+    assert config.env_flag("ALFA_TEST_FLAG", default=True) is expected
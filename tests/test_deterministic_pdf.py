@@ -0,0 +1,68 @@
+"""Deterministic PDF output: same inputs, same bytes, whatever the clock says.
+
+The golden PDFs in tests/golden/ are the expected renders of the benchmark
+samples. They are compared by their decoded content streams and their
+/ID, /CreationDate and /ModDate entries rather than byte for byte, so a
+ReportLab upgrade that only changes compression or object layout does not
+fail the test. After an intended change to the layout, regenerate them with
+ALFA_UPDATE_GOLDEN=1 python -m pytest tests/test_deterministic_pdf.py
+"""
+import os
+import time
+
+import pytest
+
+from bench_pdf import SAMPLE_QUOTATION, SAMPLE_RECEIPT
+from config import env_flag
+from documents import render_quotation, render_receipt
+from pdf_streams import content_streams, info_field
+
+GOLDEN_DIR = os.path.join(os.path.dirname(__file__), "golden")
+UPDATE_GOLDEN = env_flag("ALFA_UPDATE_GOLDEN")
+
+CASES = {
+    "quotation": (render_quotation, SAMPLE_QUOTATION),
+    "receipt": (render_receipt, SAMPLE_RECEIPT),
+}
+
+
+def _render(kind, **overrides):
+    render, sample = CASES[kind]
+    return render(**dict(sample, **overrides), deterministic=True).getvalue()
+
+
+def _file_id(pdf):
+    file_id = info_field(pdf, "ID")
+    assert file_id, "PDF has no /ID entry"
+    return file_id
+
+
+def _next_second():
+    # Sleep past the next wall-clock second, so a timestamp would differ
+    time.sleep(1.05 - time.time() % 1)
+
+
+@pytest.mark.parametrize("kind", sorted(CASES))
+def test_renders_are_byte_identical_across_a_clock_tick(kind):
+    first = _render(kind)
+    _next_second()
+    assert _render(kind) == first
+
+
+@pytest.mark.parametrize("kind", sorted(CASES))
+def test_render_matches_golden_pdf(kind):
+    pdf = _render(kind)
+    path = os.path.join(GOLDEN_DIR, f"{kind}.pdf")
+    if UPDATE_GOLDEN:
+        with open(path, "wb") as f:
+            f.write(pdf)
+    with open(path, "rb") as f:
+        golden = f.read()
+    assert content_streams(pdf) == content_streams(golden), f"{kind} page content differs from {path}"
+    for name in ("ID", "CreationDate", "ModDate"):
+        assert info_field(pdf, name) == info_field(golden, name), f"{kind} /{name} differs from {path}"
+
+
+def test_document_number_changes_file_id():
+    assert _file_id(_render("quotation")) != _file_id(_render("quotation", quote_no="ALF/25-26/10/0043"))
+    assert _file_id(_render("receipt")) != _file_id(_render("receipt", receipt_no="REC/191025/0101"))
@@ -0,0 +1,38 @@
+"""Rendering quotations and receipts: layout behaviour and input checks."""
+import pytest
+
+import documents
+from bench_pdf import SAMPLE_QUOTATION, SAMPLE_RECEIPT, SAMPLE_LONG_QUOTATION
+from config import get_config
+from pdf_streams import content_streams
+
+
+def test_braces_in_config_are_drawn_literally(monkeypatch):
+    config = get_config()
+    company = dict(config.company, head_office="Plot {7}, Sector {x}", short_name="ALFA {0}")
+    monkeypatch.setattr(documents, "get_config", lambda: config._replace(company=company))
+    monkeypatch.setattr(documents, "_plans", {})
+
+    quotation = b"".join(content_streams(documents.render_quotation(**SAMPLE_QUOTATION).getvalue(), forms=False))
+    receipt = b"".join(content_streams(documents.render_receipt(**SAMPLE_RECEIPT).getvalue(), forms=False))
+
+    assert b"(Head Office: Plot {7}, Sector {x})" in quotation
+    assert b"(ALFA {0}, " in quotation
+    assert b"(For ALFA {0})" in receipt
+
+
+def test_quotation_totals_must_match_line_items():
+    documents.render_quotation(**SAMPLE_LONG_QUOTATION)
+    with pytest.raises(ValueError, match="GST amount"):
+        documents.render_quotation(**dict(SAMPLE_LONG_QUOTATION, gst_amount=SAMPLE_QUOTATION["gst_amount"]))
+    with pytest.raises(ValueError, match="Grand total"):
+        documents.render_quotation(**dict(SAMPLE_LONG_QUOTATION,
+                                          total_inclusive_gst=SAMPLE_QUOTATION["total_inclusive_gst"]))
+
+
+def test_table_header_repeats_when_the_first_row_splits():
+    description = "\n".join(f"Instalment {n}: lens set, custom holder and calibration card" for n in range(80))
+    pdf = documents.render_receipt(**dict(SAMPLE_RECEIPT, product_description=description)).getvalue()
+    pages = content_streams(pdf, forms=False)
+    assert len(pages) > 1
+    assert all(b"(S No.)" in page for page in pages)
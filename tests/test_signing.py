@@ -0,0 +1,84 @@
+"""Signed receipts validate against the signing certificate."""
+import datetime
+import io
+
+import pytest
+
+pytest.importorskip("pyhanko")
+
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.x509.oid import NameOID
+from pyhanko.keys import load_cert_from_pemder
+from pyhanko.pdf_utils.reader import PdfFileReader
+from pyhanko.sign.validation import validate_pdf_signature
+from pyhanko_certvalidator import ValidationContext
+
+import signing
+from bench_pdf import SAMPLE_RECEIPT
+from documents import render_receipt
+
+
+@pytest.fixture(scope="module")
+def key_and_cert(tmp_path_factory):
+    """A throwaway RSA key and self-signed certificate, written as PEM files."""
+    directory = tmp_path_factory.mktemp("signing")
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "Receipt Signing Test")])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - datetime.timedelta(days=1))
+        .not_valid_after(now + datetime.timedelta(days=30))
+        .add_extension(x509.BasicConstraints(ca=True, path_length=None), critical=True)
+        .add_extension(x509.KeyUsage(digital_signature=True, content_commitment=True,
+                                     key_encipherment=False, data_encipherment=False,
+                                     key_agreement=False, key_cert_sign=True, crl_sign=False,
+                                     encipher_only=False, decipher_only=False), critical=True)
+        .sign(key, hashes.SHA256())
+    )
+    key_path, cert_path = directory / "key.pem", directory / "cert.pem"
+    key_path.write_bytes(key.private_bytes(serialization.Encoding.PEM,
+                                           serialization.PrivateFormat.PKCS8,
+                                           serialization.NoEncryption()))
+    cert_path.write_bytes(cert.public_bytes(serialization.Encoding.PEM))
+    return str(key_path), str(cert_path)
+
+
+def _bottom_line(pdf, cert_path):
+    signature = PdfFileReader(io.BytesIO(pdf)).embedded_signatures[0]
+    context = ValidationContext(trust_roots=[load_cert_from_pemder(cert_path)])
+    return validate_pdf_signature(signature, context).bottom_line
+
+
+def test_sign_pdf(key_and_cert):
+    key_path, cert_path = key_and_cert
+    pdf = render_receipt(**SAMPLE_RECEIPT).getvalue()
+    signed = signing.sign_pdf(pdf, "Payment receipt", signer=signing.load_signer(key_path, cert_path))
+    assert signed.startswith(pdf)
+    assert _bottom_line(signed, cert_path)
+
+
+def test_sign_many_in_worker_processes(key_and_cert):
+    key_path, cert_path = key_and_cert
+    jobs = [(render_receipt(**dict(SAMPLE_RECEIPT, receipt_no=f"REC/010124/{n:04d}")).getvalue(),
+             "Payment receipt") for n in (100, 101)]
+    signed = signing.sign_many(jobs, key_path, cert_path, max_workers=2)
+    assert len(signed) == 2
+    for (pdf, _), result in zip(jobs, signed):
+        assert result.startswith(pdf)
+        assert _bottom_line(result, cert_path)
+
+
+def test_default_and_explicit_settings_share_one_signer(key_and_cert, monkeypatch):
+    key_path, cert_path = key_and_cert
+    monkeypatch.setattr(signing, "SIGNING_KEY", key_path)
+    monkeypatch.setattr(signing, "SIGNING_CERT", cert_path)
+    signing._load_signer.cache_clear()
+    assert signing.load_signer() is signing.load_signer(key_path, cert_path, (), None)
+    assert signing._load_signer.cache_info().misses == 1
@@ -0,0 +1,39 @@
+"""Background pre-warming of the PDF and email stack.
+
+The apps import ReportLab, num2words, smtplib and the email MIME modules only
+when a document is first rendered or sent. Once the form is on screen,
+start_prewarm() loads them in a daemon thread (once per process) and compiles
+the layout plans, so the first Generate click does not pay for the imports.
+Set ALFA_PREWARM=0 to disable.
+"""
+import threading
+
+from config import env_flag
+
+PREWARM = env_flag("ALFA_PREWARM", default=True)
+
+_lock = threading.Lock()
+_started = False
+
+
+def _prewarm():
+    import smtplib
+    from email.mime.multipart import MIMEMultipart
+    from email.mime.text import MIMEText
+    from email.mime.application import MIMEApplication
+
+    import documents
+    documents.get_plan('quotation')
+    documents.get_plan('receipt')
+    # Loads the num2words en_IN converter
+    documents.amount_in_words(1)
+
+
+def start_prewarm():
+    """Starts the pre-warm thread unless it already ran in this process or is disabled."""
+    global _started
+    with _lock:
+        if _started or not PREWARM:
+            return
+        _started = True
+    threading.Thread(target=_prewarm, name="alfa-prewarm", daemon=True).start()
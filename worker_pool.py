@@ -0,0 +1,19 @@
+"""Process pools for batch work (rendering, signing) run from the Streamlit server."""
+import multiprocessing
+
+# Workers start from a clean server process; forking the multi-threaded Streamlit server can deadlock
+START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+
+def map_in_processes(fn, jobs, workers, initializer=None, initargs=()):
+    """Returns [fn(job) for job in jobs], computed across `workers` processes.
+
+    fn and initializer must be module-level functions, so the workers can import them.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    jobs = list(jobs)
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(START_METHOD),
+                             initializer=initializer, initargs=initargs) as pool:
+        # About four chunks per worker: few round trips, yet uneven jobs still balance out
+        return list(pool.map(fn, jobs, chunksize=max(1, len(jobs) // (workers * 4))))